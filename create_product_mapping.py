@@ -11,29 +11,25 @@ def create_product_mapping():
     # Load billing data
     billing_df = pd.read_csv("bills/IT360 Limited - Devoli Summary Bill Report 133115 2024-09-30.csv")
     
-    # Extract unique products with their details
-    products = []
-    
-    for _, row in billing_df.iterrows():
+    # Extract unique products with their details, building whole columns at once
+    if 'product' in billing_df.columns:
         # Use product as primary identifier
-        product = str(row['product']).strip() if pd.notna(row.get('product')) else ''
-        
-        # Calculate sale price (cost + 15% margin)
-        cost = float(row['amount'])
-        sale_price = round(cost * 1.15, 2)
-        
-        products.append({
-            'product_code': product,
-            'description': row['description'],
-            'cost': cost,
-            'sale_price': sale_price,
-            'margin': '15%',
-            'period': f"{row['start_date']} - {row['end_date']}",
-            'notes': ''  # For any manual additions/notes
-        })
+        product_codes = billing_df['product'].astype(str).str.strip().where(billing_df['product'].notna(), '')
+    else:
+        product_codes = ''
+    
+    # Calculate sale price (cost + 15% margin)
+    costs = billing_df['amount'].astype(float)
     
-    # Convert to DataFrame
-    products_df = pd.DataFrame(products)
+    products_df = pd.DataFrame({
+        'product_code': product_codes,
+        'description': billing_df['description'],
+        'cost': costs,
+        'sale_price': (costs * 1.15).round(2),
+        'margin': '15%',
+        'period': billing_df['start_date'].map(str) + ' - ' + billing_df['end_date'].map(str),
+        'notes': ''  # For any manual additions/notes
+    })
     
     # Remove duplicates based on product code and cost
     products_df = products_df.drop_duplicates(subset=['product_code', 'cost'])
@@ -49,10 +45,10 @@ def create_product_mapping():
     # Print summary
     print(f"Found {len(products_df)} unique products")
     print("\nProduct Codes:")
-    for code in sorted(products_df['product_code'].unique()):
+    code_counts = products_df['product_code'].value_counts()
+    for code in sorted(code_counts.index):
         if pd.notna(code) and code.strip():  # Only show non-empty codes
-            count = len(products_df[products_df['product_code'] == code])
-            print(f"- {code}: {count} variations")
+            print(f"- {code}: {code_counts[code]} variations")
     
     print(f"\nProduct mapping saved to: {output_file}")
     print("\nPlease review the product mapping CSV and:")
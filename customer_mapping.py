@@ -165,17 +165,11 @@ def test_xero_connection():
 
 def load_voip_customers(df):
     """Load only customers with VoIP/calling products"""
-    voip_products = [
-        'DDI',
-        'SIP Line',
-        'SIP Trunk',
-        'Calling',
-        'Voice'
-    ]
-    
-    mask = df['Description'].str.contains('|'.join(voip_products), case=False, na=False)
+    # Same compiled product pattern the billing processor filters on
+    mask = df['Description'].str.contains(DevoliBilling.VOIP_PATTERN, na=False)
     voip_df = df[mask]
-    return sorted(voip_df['Customer Name'].dropna().unique()), voip_df
+    customers = voip_df['Customer Name'].dropna().drop_duplicates().sort_values().tolist()
+    return customers, voip_df
 
 def mapping_page():
     st.title("Customer Mapping Tool")
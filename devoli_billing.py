@@ -1,16 +1,89 @@
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime, timedelta
 from xero_auth import XeroTokenManager, XeroAuth
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
-from fuzzywuzzy import fuzz
 from typing import Dict, Optional
 import json
 import re
+import time
 import streamlit as st
 from service_company import ServiceCompanyBilling
 
+@st.cache_data(show_spinner=False)
+def _load_billing_csv_cached(file_path: str, mtime: float) -> pd.DataFrame:
+    """Parse and normalize a Devoli billing CSV; mtime keys the cache so edits invalidate it"""
+    # Define required columns and their mappings
+    required_columns = {
+        'Invoice Number': 'invoice_number',
+        'Date': 'invoice_date', 
+        'Amount': 'amount',
+        'Customer Name': 'customer_name',
+        'Description': 'description'
+    }
+    
+    # Optional columns with defaults (Tax Rate / Product Type are never used downstream)
+    optional_columns = {
+        'Item Id': 'item_id',
+        'Short Description': 'short_description',
+        'Service Type': 'service_type',
+        'Service Item': 'service_number',
+        'Start Date': 'start_date',
+        'End Date': 'end_date'
+    }
+    
+    # Load only the columns we use so unused ones never materialize
+    needed = set(required_columns) | set(optional_columns)
+    df = pd.read_csv(file_path, usecols=lambda c: c in needed)
+    
+    # Verify required columns exist
+    missing = [col for col in required_columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    
+    # Rename required columns
+    df = df.rename(columns=required_columns)
+    
+    # Rename optional columns that exist
+    for old_col, new_col in optional_columns.items():
+        if old_col in df.columns:
+            df = df.rename(columns={old_col: new_col})
+    
+    # Clean data
+    df['customer_name'] = df['customer_name'].str.strip()
+    # Few distinct customers over many rows, so store names once as a categorical
+    df['customer_name'] = df['customer_name'].astype('category')
+    if 'service_number' in df.columns:
+        df['service_number'] = df['service_number'].astype('category')
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+    
+    # Convert dates
+    date_columns = ['start_date', 'end_date', 'invoice_date']
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    
+    # Add total column if needed
+    if 'total' not in df.columns:
+        df['total'] = df['amount']
+    
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def _load_customer_mapping_cached(file_path: str, mtime: float) -> Dict[str, str]:
+    """Read the Devoli to Xero customer mapping CSV; mtime keys the cache so edits invalidate it"""
+    mapping_df = pd.read_csv(file_path, usecols=['devoli_name', 'actual_xero_name'], dtype=str)
+    return dict(zip(
+        mapping_df['devoli_name'].str.strip(),
+        mapping_df['actual_xero_name'].str.strip()
+    ))
+
+
 class DevoliBilling:
     def __init__(self, simulation_mode=False):
         # Load environment variables
@@ -19,6 +92,8 @@ class DevoliBilling:
         self.billing_data = None
         self.xero_contacts = None
         self.customer_mapping = {}
+        self._customer_mapping_lower = {}
+        self._contacts_by_name = {}
         
         # Verify we have a valid token file
         if not os.path.exists('xero_tokens.json'):
@@ -38,6 +113,16 @@ class DevoliBilling:
         # Define Xero API URL
         self.XERO_API_URL = "https://api.xero.com/api.xro/2.0"
         
+        # Shared HTTP session so Xero calls reuse keep-alive connections
+        self._session = requests.Session()
+        self._session.headers.update({'Accept': 'application/json'})
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self._session.mount('https://', adapter)
+        
         # Load customer mapping silently
         self.load_customer_mapping()
         
@@ -48,6 +133,50 @@ class DevoliBilling:
     CALLS_PATTERN = re.compile(r'(?:.*?\()(\d+) calls? - ((?:\d+ days? )?[\d:]+)\)')
     TRUNK_PATTERN = re.compile(r'trunk: (\d+)')
     DURATION_PATTERN = re.compile(r'(?:(\d+) days? )?(\d{1,2}):(\d{2}):(\d{2})')
+    HHMMSS_PATTERN = re.compile(r'^\d+:\d{2}:\d{2}$')
+    
+    # Seconds and whole minutes per (days, hours, minutes, seconds) duration component
+    DURATION_SECONDS = np.array([86400, 3600, 60, 1])
+    DURATION_MINUTES = np.array([1440, 60, 1, 0])
+    
+    # Duration with optional days, split into (days, hours, minutes, seconds)
+    DURATION_PARTS_PATTERN = re.compile(r'(?:(\d+) days? )?(\d+):(\d{2}):(\d{2})')
+    # Call categories used when aggregating call data
+    CALL_CATEGORY_PATTERN = re.compile(r'(Australia|Local|Mobile|National)', re.IGNORECASE)
+    
+    # Product description patterns used to classify invoice rows
+    DDI_PATTERN = re.compile(r'DDI', re.IGNORECASE)
+    SIP_LINE_PATTERN = re.compile(r'SIP Line', re.IGNORECASE)
+    UFB_PATTERN = re.compile(r'/29 Range|Static IP')
+    VOIP_PATTERN = re.compile(r'DDI|SIP Line|SIP Trunk|Calling|Voice', re.IGNORECASE)
+    
+    # Call type classification in priority order. Each group is a zero-width lookahead
+    # so the first alternative that applies anywhere in the description wins, matching
+    # the original if/elif precedence rather than leftmost-match order.
+    CALL_TYPE_PATTERN = re.compile(
+        r'(?=.*TFree Inbound)(?:'
+        r'(?P<tfree_aus_mobile>(?=.*AUS Mobile))|'
+        r'(?P<tfree_aus_national>(?=.*AUS National))|'
+        r'(?P<tfree_mobile>(?=.*Mobile))|'
+        r'(?P<tfree_national>(?=.*National))|'
+        r'(?P<tfree_australia>(?=.*Australia)))|'
+        r'(?P<australia>(?=.*Australia))|'
+        r'(?P<mobile>(?=.*Mobile))|'
+        r'(?P<national>(?=.*National))|'
+        r'(?P<local>(?=.*Local))',
+        re.DOTALL
+    )
+    _CALL_TYPE_LABELS = {
+        'tfree_aus_mobile': 'TFree Mobile',
+        'tfree_aus_national': 'TFree National',
+        'tfree_mobile': 'TFree Mobile',
+        'tfree_national': 'TFree National',
+        'tfree_australia': 'TFree Australia',
+        'australia': 'Australian Calls',
+        'mobile': 'Mobile Calls',
+        'national': 'National Calls',
+        'local': 'Local Calls'
+    }
 
     # Add these as class constants
     SPECIAL_CUSTOMERS = {
@@ -67,6 +196,9 @@ class DevoliBilling:
         }
     }
     
+    # Maximum invoices per POST to the Xero Invoices endpoint
+    INVOICE_BATCH_SIZE = 50
+    
     STANDARD_RATES = {
         'local': 0.05,
         'mobile': 0.12,
@@ -79,57 +211,8 @@ class DevoliBilling:
         """Load and validate the Devoli billing CSV"""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Billing CSV file not found: {file_path}")
-            
-        # Load CSV with all columns
-        df = pd.read_csv(file_path)
-        
-        # Define required columns and their mappings
-        required_columns = {
-            'Invoice Number': 'invoice_number',
-            'Date': 'invoice_date', 
-            'Amount': 'amount',
-            'Customer Name': 'customer_name',
-            'Description': 'description'
-        }
-        
-        # Optional columns with defaults
-        optional_columns = {
-            'Item Id': 'item_id',
-            'Short Description': 'short_description',
-            'Tax Rate': 'tax_rate',
-            'Product Type': 'product_type',
-            'Service Type': 'service_type',
-            'Service Item': 'service_number',
-            'Start Date': 'start_date',
-            'End Date': 'end_date'
-        }
-        
-        # Verify required columns exist
-        missing = [col for col in required_columns if col not in df.columns]
-        if missing:
-            raise ValueError(f"Missing required columns: {', '.join(missing)}")
-        
-        # Rename required columns
-        df = df.rename(columns=required_columns)
         
-        # Rename optional columns that exist
-        for old_col, new_col in optional_columns.items():
-            if old_col in df.columns:
-                df = df.rename(columns={old_col: new_col})
-        
-        # Clean data
-        df['customer_name'] = df['customer_name'].str.strip()
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        
-        # Convert dates
-        date_columns = ['start_date', 'end_date', 'invoice_date']
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        # Add total column if needed
-        if 'total' not in df.columns:
-            df['total'] = df['amount']
+        df = _load_billing_csv_cached(file_path, os.path.getmtime(file_path))
         
         print(f"\nLoaded {len(df)} billing items")
         print("\nColumns:", df.columns.tolist())
@@ -142,18 +225,17 @@ class DevoliBilling:
         if self.billing_data is None:
             raise ValueError("No billing data loaded. Call load_csv first.")
             
-        # Clean customer names once
-        self.billing_data['customer_name'] = self.billing_data['customer_name'].str.strip()
+        # Customer names are stripped once in load_csv
         
         # Use groupby iterator for efficiency
         customer_items = {}
         
         # Group once and iterate over groups silently
-        for customer, items in self.billing_data.groupby('customer_name'):
+        for customer, items in self.billing_data.groupby('customer_name', observed=True):
             customer_items[customer] = items
         
         # Get summary data
-        grouped = self.billing_data.groupby('customer_name').agg({
+        grouped = self.billing_data.groupby('customer_name', observed=True).agg({
             'amount': 'sum',
             'invoice_date': 'first',
             'start_date': 'first', 
@@ -165,29 +247,29 @@ class DevoliBilling:
     def ensure_xero_connection(self, force_refresh=False):
         """Ensure we have a valid Xero connection"""
         try:
-            # Use session state to store headers
-            if not force_refresh and 'xero_headers' in st.session_state:
+            # Reuse cached headers while the in-memory token is still valid (5 minute buffer)
+            token_valid = time.time() + 300 < self.token_manager.tokens.get('expires_at', 0)
+            if not force_refresh and token_valid and 'xero_headers' in st.session_state:
                 return st.session_state.xero_headers
             
             # Force token refresh to ensure we have valid tokens
             self.token_manager.refresh_token_if_expired(force_refresh=force_refresh)
             
-            # Get headers with fresh token
-            headers = self.token_manager.get_auth_headers()
-            
-            # Test connection silently
-            response = requests.get(
-                "https://api.xero.com/connections",
-                headers=headers
-            )
-            response.raise_for_status()
-            
-            # Get tenant ID if not set
+            # Only probe connections to bootstrap the tenant ID
             if not self.token_manager.tokens.get('tenant_id'):
+                response = self._session.get(
+                    "https://api.xero.com/connections",
+                    headers=self.token_manager.get_auth_headers()
+                )
+                response.raise_for_status()
+                
                 tenants = response.json()
                 if tenants:
                     self.token_manager.set_tenant_id(tenants[0]['tenantId'])
             
+            # Get headers with fresh token
+            headers = self.token_manager.get_auth_headers()
+            
             # Store headers in session state
             st.session_state.xero_headers = headers
             return headers
@@ -196,21 +278,34 @@ class DevoliBilling:
             st.error(f"Xero connection error: {str(e)}")
             raise
 
+    def _xero_request(self, method, url, **kwargs):
+        """Send a Xero API request, re-authenticating and retrying once on 401"""
+        response = self._session.request(method, url, headers=self.ensure_xero_connection(), **kwargs)
+        if response.status_code == 401:
+            # Cached headers are stale, drop them and retry with a refreshed token
+            st.session_state.pop('xero_headers', None)
+            response = self._session.request(
+                method, url, headers=self.ensure_xero_connection(force_refresh=True), **kwargs
+            )
+        return response
+
     def format_call_description(self, call_data):
         """Format calling charges description with details"""
         lines = ["Devoli calling charges:"]
         
         # Handle case where call_data is a DataFrame (old format)
         if isinstance(call_data, pd.DataFrame):
-            # Filter for call-related rows
-            call_mask = call_data['description'].str.contains('Calls', case=False, na=False)
-            call_data = call_data[call_mask]
+            # Lowercase descriptions once and filter for call-related rows
+            desc_arr = call_data['description'].fillna('').to_numpy(dtype=str)
+            lower_arr = np.char.lower(desc_arr)
+            call_rows = np.char.find(lower_arr, 'calls') >= 0
+            desc_arr, lower_arr = desc_arr[call_rows], lower_arr[call_rows]
             
-            # Process each call type
+            # Process each call type, using the first matching description
             for call_type in ['Australia', 'Local', 'Mobile', 'National']:
-                mask = call_data['description'].str.contains(call_type, case=False, na=False)
-                if mask.any():
-                    desc = call_data[mask]['description'].iloc[0]
+                hit_idx = np.flatnonzero(np.char.find(lower_arr, call_type.lower()) >= 0)
+                if hit_idx.size:
+                    desc = desc_arr[hit_idx[0]]
                     count, duration = self.parse_call_info(desc)
                     if count > 0:
                         lines.append(f"{call_type} Calls ({count} calls - {duration})")
@@ -243,16 +338,20 @@ class DevoliBilling:
         total_charge = 0
         call_details = []  # Store details for later display
         
+        # Lowercase descriptions once for all call type lookups
+        desc_arr = data['description'].fillna('').to_numpy(dtype=str)
+        lower_arr = np.char.lower(desc_arr)
+        
         # Debug print for troubleshooting
         print(f"Processing call charges for data with {len(data)} rows")
         if not data.empty:
-            print(f"First row description: {data['description'].iloc[0]}")
+            print(f"First row description: {desc_arr[0]}")
         
         # Use self.rates instead of local rates dictionary
         for call_type, rate in self.rates.items():
-            mask = data['description'].str.lower().str.contains(call_type.lower(), na=False)
-            if mask.any():
-                calls = data[mask]['description'].iloc[0]
+            hit_idx = np.flatnonzero(np.char.find(lower_arr, call_type.lower()) >= 0)
+            if hit_idx.size:
+                calls = desc_arr[hit_idx[0]]
                 count, duration = self.parse_call_info(calls)
                 if count > 0:
                     minutes = self.duration_to_minutes(duration)
@@ -300,231 +399,302 @@ class DevoliBilling:
     def create_xero_invoice(self, customer, customer_data, invoice_params=None):
         """Create a draft invoice in Xero"""
         try:
-            # Check if invoices to The Service Company should be logged without submission
-            debug_tsc_invoices = os.environ.get('DEBUG_TSC_INVOICES', 'false').lower() == 'true'
+            result = self.create_xero_invoices_batch([(customer, customer_data, invoice_params)])[0]
+            if isinstance(result, Exception):
+                raise result
             
-            # Normalize column names to lowercase for case-insensitive comparison
-            if isinstance(customer_data, pd.DataFrame):
-                customer_data.columns = customer_data.columns.str.lower()
+            # Surface per-invoice validation errors the same way a rejected POST would
+            if result and result['Invoices'] and result['Invoices'][0].get('HasErrors'):
+                errors = [err.get('Message', '') for err in result['Invoices'][0].get('ValidationErrors', [])]
+                raise ValueError(f"Xero rejected invoice for {customer}: {'; '.join(errors)}")
             
-            # Validate and set defaults for invoice params
-            if invoice_params is None:
-                invoice_params = {}
+            return result
             
-            today = datetime.now().strftime('%Y-%m-%d')
-            invoice_params = {
-                'date': invoice_params.get('date', today),
-                'due_date': invoice_params.get('due_date', 
-                    (datetime.now() + timedelta(days=14)).strftime('%Y-%m-%d')),
-                'description': invoice_params.get('description', ''),
-                'line_items': invoice_params.get('line_items', []),
-                'pre_calculated_results': invoice_params.get('pre_calculated_results', None),
-                'status': invoice_params.get('status', 'DRAFT'),
-                'type': invoice_params.get('type', 'ACCREC'),
-                'reference': invoice_params.get('reference', f"Devoli Calling Charges - {datetime.now().strftime('%B %Y')}"),
-                'line_amount_types': invoice_params.get('line_amount_types', 'Exclusive')
-            }
+        except Exception as e:
+            print(f"Error creating Xero invoice: {str(e)}")
+            if hasattr(e, 'response'):
+                print(f"Response: {e.response.text}")
+            raise
+
+    def create_xero_invoices_batch(self, jobs):
+        """Create draft invoices in Xero, posting up to INVOICE_BATCH_SIZE per request
+        
+        jobs is a list of (customer, customer_data, invoice_params) tuples. Returns a
+        list aligned with jobs holding the Xero response for each invoice, None where
+        the invoice was skipped, or the exception raised while preparing the invoice
+        or posting its batch. A failed job or batch doesn't stop the others, so
+        invoices Xero has already created are always returned to be logged.
+        
+        The app's invoicing loops still go through create_xero_invoice one customer
+        at a time, so they make one POST per invoice; only callers that pass several
+        jobs here together get the per-batch round trips.
+        """
+        results = [None] * len(jobs)
+        pending = []
+        
+        for i, (customer, customer_data, invoice_params) in enumerate(jobs):
+            try:
+                payload = self._build_invoice_payload(customer, customer_data, invoice_params)
+            except Exception as e:
+                # e.g. no Xero contact for this customer; the other jobs still go ahead
+                print(f"Error preparing invoice for {customer}: {str(e)}")
+                results[i] = e
+                continue
+            if payload is None:
+                continue
+            # DEBUG_TSC_INVOICES returns a mock response that is never sent to Xero
+            if 'Invoices' in payload:
+                results[i] = payload
+                continue
+            pending.append((i, payload))
+        
+        if not pending:
+            return results
+        
+        for start in range(0, len(pending), self.INVOICE_BATCH_SIZE):
+            batch = pending[start:start + self.INVOICE_BATCH_SIZE]
             
-            # Check if this is The Service Company
-            is_service_company = customer.strip().lower() == 'the service company'
-            account_code = self.SPECIAL_CUSTOMERS['the service company']['account_code'] if is_service_company else '43850'
+            try:
+                data = self._post_invoice_batch(batch)
+            except Exception as e:
+                print(f"Error posting invoice batch of {len(batch)}: {str(e)}")
+                for i, _ in batch:
+                    results[i] = e
+                continue
             
-            # Create line items
-            line_items = []
+            for (i, _), invoice in zip(batch, data.get('Invoices', [])):
+                if invoice.get('HasErrors'):
+                    print(f"⚠️ Xero rejected invoice for {jobs[i][0]}: {invoice.get('ValidationErrors')}")
+                results[i] = {
+                    "Id": data.get("Id"),
+                    "Status": data.get("Status"),
+                    "Invoices": [invoice]
+                }
+        
+        return results
+
+    def _post_invoice_batch(self, batch):
+        """POST one batch of (job index, payload) pairs to the Xero Invoices endpoint"""
+        # summarizeErrors=false lets valid invoices through when others in the batch fail
+        response = self._xero_request(
+            'POST',
+            f"{self.XERO_API_URL}/Invoices",
+            params={'summarizeErrors': 'false'},
+            json={"Invoices": [payload for _, payload in batch]}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _build_invoice_payload(self, customer, customer_data, invoice_params=None):
+        """Build the Xero invoice payload for a customer, or None if there is nothing to bill"""
+        # Check if invoices to The Service Company should be logged without submission
+        debug_tsc_invoices = os.environ.get('DEBUG_TSC_INVOICES', 'false').lower() == 'true'
+        
+        # Normalize column names to lowercase for case-insensitive comparison
+        if isinstance(customer_data, pd.DataFrame):
+            customer_data.columns = customer_data.columns.str.lower()
+        
+        # Validate and set defaults for invoice params
+        if invoice_params is None:
+            invoice_params = {}
+        
+        today = datetime.now().strftime('%Y-%m-%d')
+        invoice_params = {
+            'date': invoice_params.get('date', today),
+            'due_date': invoice_params.get('due_date', 
+                (datetime.now() + timedelta(days=14)).strftime('%Y-%m-%d')),
+            'description': invoice_params.get('description', ''),
+            'line_items': invoice_params.get('line_items', []),
+            'pre_calculated_results': invoice_params.get('pre_calculated_results', None),
+            'status': invoice_params.get('status', 'DRAFT'),
+            'type': invoice_params.get('type', 'ACCREC'),
+            'reference': invoice_params.get('reference', f"Devoli Calling Charges - {datetime.now().strftime('%B %Y')}"),
+            'line_amount_types': invoice_params.get('line_amount_types', 'Exclusive')
+        }
+        
+        # Check if this is The Service Company
+        is_service_company = customer.strip().lower() == 'the service company'
+        account_code = self.SPECIAL_CUSTOMERS['the service company']['account_code'] if is_service_company else '43850'
+        
+        # Create line items, keeping a running total as they are added
+        line_items = []
+        total_invoice_amount = 0.0
+        
+        # Use provided line items if available
+        if invoice_params.get('line_items'):
+            line_items = invoice_params['line_items']
+            total_invoice_amount = sum(item.get("UnitAmount", 0) * item.get("Quantity", 1) for item in line_items)
+            print(f"Using provided line items ({len(line_items)} items)")
             
-            # Use provided line items if available
-            if invoice_params.get('line_items'):
-                line_items = invoice_params['line_items']
-                print(f"Using provided line items ({len(line_items)} items)")
-                
-                # Special logging for TSC
-                if is_service_company:
-                    print(f"The Service Company invoice with {len(line_items)} line items")
-                    # Log each line item for debugging
-                    for i, item in enumerate(line_items):
-                        desc_preview = item.get("Description", "")
-                        if len(desc_preview) > 100:
-                            desc_preview = desc_preview[:97] + "..."
-                        print(f"  Item {i+1}: {desc_preview} - ${item.get('UnitAmount', 0)}")
+            # Special logging for TSC
+            if is_service_company:
+                print(f"The Service Company invoice with {len(line_items)} line items")
+                # Log each line item for debugging
+                for i, item in enumerate(line_items):
+                    desc_preview = item.get("Description", "")
+                    if len(desc_preview) > 100:
+                        desc_preview = desc_preview[:97] + "..."
+                    print(f"  Item {i+1}: {desc_preview} - ${item.get('UnitAmount', 0)}")
+            
+            # If this is debug mode for TSC, return a mock invoice
+            if debug_tsc_invoices and is_service_company:
+                print("DEBUG_TSC_INVOICES is enabled, returning mock invoice")
+                return {
+                    "Id": "debug-mode",
+                    "Status": "OK",
+                    "Invoices": [
+                        {
+                            "Type": "ACCREC",
+                            "InvoiceID": "debug-mode-id",
+                            "InvoiceNumber": f"DEBUG-{datetime.now().strftime('%Y%m%d%H%M')}",
+                            "Reference": invoice_params.get('reference'),
+                            "LineItems": line_items
+                        }
+                    ]
+                }
+        else:
+            # Only calculate charges if line items were not provided
+            # Calculate charges and format description 
+            if isinstance(customer_data, pd.DataFrame):
+                calling_charges, call_details = self.calculate_call_charges(customer_data)
+                invoice_desc = invoice_params.get('description', '')
+                if not invoice_desc:
+                    invoice_desc = self.format_call_description(call_details)
                 
-                # If this is debug mode for TSC, return a mock invoice
-                if debug_tsc_invoices and is_service_company:
-                    print("DEBUG_TSC_INVOICES is enabled, returning mock invoice")
-                    return {
-                        "Id": "debug-mode",
-                        "Status": "OK",
-                        "Invoices": [
-                            {
-                                "Type": "ACCREC",
-                                "InvoiceID": "debug-mode-id",
-                                "InvoiceNumber": f"DEBUG-{datetime.now().strftime('%Y%m%d%H%M')}",
-                                "Reference": invoice_params.get('reference'),
-                                "LineItems": line_items
-                            }
-                        ]
-                    }
-            else:
-                # Only calculate charges if line items were not provided
-                # Calculate charges and format description 
-                if isinstance(customer_data, pd.DataFrame):
-                    calling_charges, call_details = self.calculate_call_charges(customer_data)
-                    invoice_desc = invoice_params.get('description', '')
-                    if not invoice_desc:
-                        invoice_desc = self.format_call_description(call_details)
-                    
-                    # Add calling charges line item
-                    if calling_charges > 0:
-                        line_items.append({
-                            "Description": invoice_desc,
-                            "Quantity": 1.0,
-                            "UnitAmount": float(calling_charges),
-                            "AccountCode": account_code,
-                            "TaxType": "OUTPUT2"
-                        })
+                # Add calling charges line item
+                if calling_charges > 0:
+                    line_items.append({
+                        "Description": invoice_desc,
+                        "Quantity": 1.0,
+                        "UnitAmount": float(calling_charges),
+                        "AccountCode": account_code,
+                        "TaxType": "OUTPUT2"
+                    })
+                    total_invoice_amount += float(calling_charges)
+        
+        # Skip if no charges or if the total amount is $0
+        if not line_items and isinstance(customer_data, pd.DataFrame):
+            # Check if there's call data before skipping
+            call_mask = customer_data['description'].str.contains('Calls', case=False, na=False)
+            call_data = customer_data[call_mask]
             
-            # Skip if no charges or if the total amount is $0
-            if not line_items and isinstance(customer_data, pd.DataFrame):
-                # Check if there's call data before skipping
-                call_mask = customer_data['description'].str.contains('Calls', case=False, na=False)
-                call_data = customer_data[call_mask]
+            if len(call_data) > 0:
+                # We have call data but no line items, calculate charges properly
+                print(f"⚠️ {customer} has call data but no line items, calculating charges")
+                calling_charges, call_details = self.calculate_call_charges(call_data)
                 
-                if len(call_data) > 0:
-                    # We have call data but no line items, calculate charges properly
-                    print(f"⚠️ {customer} has call data but no line items, calculating charges")
-                    calling_charges, call_details = self.calculate_call_charges(call_data)
-                    
-                    if calling_charges > 0:
-                        # Create a line item using our calculated charges
-                        invoice_desc = self.format_call_description(call_details)
+                if calling_charges > 0:
+                    # Create a line item using our calculated charges
+                    invoice_desc = self.format_call_description(call_details)
+                    line_items.append({
+                        "Description": invoice_desc,
+                        "Quantity": 1.0,
+                        "UnitAmount": float(calling_charges),
+                        "AccountCode": account_code,
+                        "TaxType": "OUTPUT2"
+                    })
+                    total_invoice_amount += float(calling_charges)
+                else:
+                    # If our calculation still gives 0, fall back to the Amount column
+                    print(f"⚠️ Calculated charges are 0, falling back to Amount column")
+                    total_amount = call_data['amount'].sum()
+                    if total_amount > 0:
+                        call_desc = call_data['description'].iloc[0]
                         line_items.append({
-                            "Description": invoice_desc,
+                            "Description": f"Calling charges: {call_desc}",
                             "Quantity": 1.0,
-                            "UnitAmount": float(calling_charges),
+                            "UnitAmount": float(total_amount),
                             "AccountCode": account_code,
                             "TaxType": "OUTPUT2"
                         })
+                        total_invoice_amount += float(total_amount)
                     else:
-                        # If our calculation still gives 0, fall back to the Amount column
-                        print(f"⚠️ Calculated charges are 0, falling back to Amount column")
-                        total_amount = call_data['amount'].sum()
-                        if total_amount > 0:
-                            call_desc = call_data['description'].iloc[0]
-                            line_items.append({
-                                "Description": f"Calling charges: {call_desc}",
-                                "Quantity": 1.0,
-                                "UnitAmount": float(total_amount),
-                                "AccountCode": account_code,
-                                "TaxType": "OUTPUT2"
-                            })
-                        else:
-                            print(f"ℹ️ Skipping {customer} - $0 invoice (no charges in call data)")
-                            return None
-                else:
-                    print(f"ℹ️ Skipping {customer} - $0 invoice (no call data)")
-                    return None
-                    
-            # Skip completely empty line items
-            if not line_items:
-                print(f"ℹ️ Skipping {customer} - no line items to process")
+                        print(f"ℹ️ Skipping {customer} - $0 invoice (no charges in call data)")
+                        return None
+            else:
+                print(f"ℹ️ Skipping {customer} - $0 invoice (no call data)")
                 return None
                 
-            # Calculate total invoice amount
-            total_invoice_amount = sum(item.get("UnitAmount", 0) * item.get("Quantity", 1) for item in line_items)
-            
-            # Skip if total invoice amount is $0 or negative
-            if total_invoice_amount <= 0:
-                print(f"ℹ️ Skipping {customer} - ${total_invoice_amount} invoice amount (zero or negative total)")
-                return None
+        # Skip completely empty line items
+        if not line_items:
+            print(f"ℹ️ Skipping {customer} - no line items to process")
+            return None
             
-            # Find Xero contact - first check if the customer name is already a Xero name
-            # This is the case when we get the customer name from the UI where it's already mapped
-            xero_name = customer.strip()
+        # Skip if total invoice amount is $0 or negative
+        if total_invoice_amount <= 0:
+            print(f"ℹ️ Skipping {customer} - ${total_invoice_amount} invoice amount (zero or negative total)")
+            return None
+        
+        # Find Xero contact by exact name, then via the mapping
+        xero_contact = self._resolve_contact(customer)
+        
+        # Create the invoice
+        # Get the invoice date from parameters
+        invoice_date = invoice_params.get('date')
+        if not invoice_date:
+            raise ValueError("No invoice date provided in parameters")
             
-            # Check if this name exists in Xero contacts
-            contacts = self.fetch_xero_contacts()
-            if not contacts:
+        # Calculate due date (20 days after invoice date)
+        due_date = invoice_params.get('due_date', 
+            (pd.to_datetime(invoice_date) + pd.Timedelta(days=20)).strftime('%Y-%m-%d'))
+        
+        # For reference, use the month name from the invoice date
+        invoice_data = {
+            "Type": invoice_params.get('type', 'ACCREC'),
+            "Contact": xero_contact,
+            "LineItems": line_items,
+            "Date": invoice_date,
+            "DueDate": due_date,
+            "Reference": invoice_params.get('reference', f"Devoli Calling Charges - {pd.to_datetime(invoice_date).strftime('%B %Y')}"),
+            "Status": invoice_params.get('status', 'DRAFT'),
+            "LineAmountTypes": invoice_params.get('line_amount_types', 'Exclusive')
+        }
+        
+        # Add debug logging
+        print(f"Creating Xero invoice for {customer}")
+        print(f"Line items: {json.dumps(line_items, indent=2)}")
+
+        return invoice_data
+
+    def _resolve_contact(self, customer: str) -> Dict:
+        """Resolve a customer name to a Xero contact
+        
+        Tries the name itself first (the UI may pass names that are already mapped),
+        then the mapped Xero name. Both are exact, case-insensitive lookups.
+        """
+        if not self._contacts_by_name:
+            if not self.fetch_xero_contacts():
                 raise ValueError("Failed to fetch Xero contacts")
-            
-            # Try direct match first
-            xero_contact = None
-            search_name = xero_name.lower()
-            for contact in contacts:
-                if contact['Name'].lower() == search_name:
-                    xero_contact = contact
-                    break
-            
-            # If no direct match, try using the mapping
-            if not xero_contact:
-                # Try to find via mapping
-                mapped_name = self.customer_mapping.get(customer.strip())
-                if not mapped_name:
-                    raise ValueError(f"No Xero mapping found for {customer}")
-                
-                # Search again with mapped name
-                search_name = mapped_name.lower()
-                for contact in contacts:
-                    if contact['Name'].lower() == search_name:
-                        xero_contact = contact
-                        break
-            
-            if not xero_contact:
-                raise ValueError(f"Contact '{xero_name}' not found in Xero")
-            
-            # Create the invoice
-            # Get the invoice date from parameters
-            invoice_date = invoice_params.get('date')
-            if not invoice_date:
-                raise ValueError("No invoice date provided in parameters")
-                
-            # Calculate due date (20 days after invoice date)
-            due_date = invoice_params.get('due_date', 
-                (pd.to_datetime(invoice_date) + pd.Timedelta(days=20)).strftime('%Y-%m-%d'))
-            
-            # For reference, use the month name from the invoice date
-            invoice_data = {
-                "Type": invoice_params.get('type', 'ACCREC'),
-                "Contact": xero_contact,
-                "LineItems": line_items,
-                "Date": invoice_date,
-                "DueDate": due_date,
-                "Reference": invoice_params.get('reference', f"Devoli Calling Charges - {pd.to_datetime(invoice_date).strftime('%B %Y')}"),
-                "Status": invoice_params.get('status', 'DRAFT'),
-                "LineAmountTypes": invoice_params.get('line_amount_types', 'Exclusive')
-            }
-            
-            # Add debug logging
-            print(f"Creating Xero invoice for {customer}")
-            print(f"Line items: {json.dumps(line_items, indent=2)}")
-            
-            # Send to Xero
-            headers = self.ensure_xero_connection()
-            headers['Accept'] = 'application/json'
-            
-            response = requests.post(
-                "https://api.xero.com/api.xro/2.0/Invoices",
-                headers=headers,
-                json={"Invoices": [invoice_data]}
-            )
-            response.raise_for_status()
-            return response.json()
-            
-        except Exception as e:
-            print(f"Error creating Xero invoice: {str(e)}")
-            if hasattr(e, 'response'):
-                print(f"Response: {e.response.text}")
-            raise
+        
+        key = customer.strip().lower()
+        hit = self._contacts_by_name.get(key)
+        if hit:
+            return hit
+        
+        mapped = self._customer_mapping_lower.get(key)
+        if not mapped:
+            raise ValueError(f"No Xero mapping found for {customer}")
+        
+        hit = self._contacts_by_name.get(mapped)
+        if not hit:
+            raise ValueError(f"Contact '{customer.strip()}' not found in Xero")
+        return hit
+
+    def clear_contact_cache(self):
+        """Forget the fetched Xero contacts; the next contact lookup fetches them again.
+        
+        Called once at the start of an invoicing run so the run sees current contacts
+        while every invoice in it shares a single fetch.
+        """
+        self.xero_contacts = None
+        self._contacts_by_name = {}
 
     def fetch_xero_contacts(self):
         """Fetch all contacts from Xero"""
-        headers = self.ensure_xero_connection()
-        
         try:
-            # Add Accept header to request JSON
-            headers['Accept'] = 'application/json'
-            
-            response = requests.get(
-                "https://api.xero.com/api.xro/2.0/Contacts",
-                headers=headers
+            response = self._xero_request(
+                'GET',
+                "https://api.xero.com/api.xro/2.0/Contacts"
             )
             response.raise_for_status()
             
@@ -532,6 +702,11 @@ class DevoliBilling:
                 data = response.json()
                 if 'Contacts' in data:
                     self.xero_contacts = data['Contacts']
+                    # Reversed so the first contact wins when Xero has duplicate names
+                    self._contacts_by_name = {
+                        contact['Name'].strip().lower(): contact
+                        for contact in reversed(self.xero_contacts)
+                    }
                     return self.xero_contacts
                 else:
                     print("Warning: No 'Contacts' key in response")
@@ -550,43 +725,8 @@ class DevoliBilling:
                 print(f"Response Text: {e.response.text[:500]}")
             raise
 
-    def find_best_match(self, devoli_name: str) -> Optional[Dict]:
-        """Find the best matching Xero contact for a Devoli customer name"""
-        if not self.xero_contacts:
-            self.fetch_xero_contacts()
-        
-        if not hasattr(self, '_contact_names_cache'):
-            # Create cache of lowercase names
-            self._contact_names_cache = {
-                contact['ContactID']: contact['Name'].strip().lower()
-                for contact in self.xero_contacts
-            }
-        
-        # Clean the Devoli name once
-        devoli_name = devoli_name.strip().lower()
-        
-        # Try exact match first (using cache)
-        for contact in self.xero_contacts:
-            if self._contact_names_cache[contact['ContactID']] == devoli_name:
-                return contact
-        
-        # Fuzzy match if needed
-        best_match = None
-        best_score = 0
-        
-        # Use pre-computed lowercase names
-        for contact in self.xero_contacts:
-            score = fuzz.ratio(self._contact_names_cache[contact['ContactID']], devoli_name)
-            if score > best_score and score > 80:
-                best_score = score
-                best_match = contact
-        
-        return best_match
-
     def create_xero_contact(self, customer_name: str) -> Optional[Dict]:
         """Create a new contact in Xero"""
-        headers = self.ensure_xero_connection()
-        
         contact = {
             "Name": customer_name,
             "FirstName": "",
@@ -596,13 +736,17 @@ class DevoliBilling:
         }
         
         try:
-            response = requests.post(
+            response = self._xero_request(
+                'POST',
                 "https://api.xero.com/api.xro/2.0/Contacts",
-                headers=headers,
                 json={"Contacts": [contact]}
             )
             response.raise_for_status()
             new_contact = response.json()['Contacts'][0]
+            # Keep the cached contact lookups in step with Xero
+            if self.xero_contacts is not None:
+                self.xero_contacts.append(new_contact)
+            self._contacts_by_name.setdefault(new_contact['Name'].strip().lower(), new_contact)
             print(f"✓ Created new Xero contact for {customer_name}")
             return new_contact
         except Exception as e:
@@ -615,13 +759,15 @@ class DevoliBilling:
             if not os.path.exists('customer_mapping.csv'):
                 raise FileNotFoundError("Customer mapping file not found")
             
-            mapping_df = pd.read_csv('customer_mapping.csv')
-            
             # Create mapping dictionary without debug prints
-            self.customer_mapping = dict(zip(
-                mapping_df['devoli_name'].str.strip(),
-                mapping_df['actual_xero_name'].str.strip()
-            ))
+            self.customer_mapping = _load_customer_mapping_cached(
+                'customer_mapping.csv', os.path.getmtime('customer_mapping.csv')
+            )
+            # Lowercased keys and values so lookups feed straight into _contacts_by_name
+            self._customer_mapping_lower = {
+                devoli_name.lower(): xero_name.lower()
+                for devoli_name, xero_name in self.customer_mapping.items()
+            }
             
         except Exception as e:
             st.error(f"Error loading customer mapping: {str(e)}")
@@ -643,30 +789,14 @@ class DevoliBilling:
 
     def get_call_type(self, description):
         """Determine call type from description"""
-        # Handle special cases first
-        if "TFree Inbound" in description:
-            if "AUS Mobile" in description:
-                return "TFree Mobile"
-            elif "AUS National" in description:
-                return "TFree National"
-            elif "Mobile" in description:
-                return "TFree Mobile"
-            elif "National" in description:
-                return "TFree National"
-            elif "Australia" in description:
-                return "TFree Australia"
-        
-        # Handle standard call types
-        if "Australia" in description:
-            return "Australian Calls"
-        elif "Mobile" in description:
-            return "Mobile Calls"
-        elif "National" in description:
-            return "National Calls"
-        elif "Local" in description:
-            return "Local Calls"
-        else:
-            return "Other Calls"
+        match = self.CALL_TYPE_PATTERN.match(description)
+        return self._CALL_TYPE_LABELS.get(match.lastgroup, 'Other Calls') if match else 'Other Calls'
+
+    def get_call_types(self, descriptions: pd.Series) -> pd.Series:
+        """Vectorized get_call_type over a Series of descriptions"""
+        matched = descriptions.str.extract(self.CALL_TYPE_PATTERN).notna()
+        labels = matched.idxmax(axis=1).map(self._CALL_TYPE_LABELS)
+        return labels.where(matched.any(axis=1), 'Other Calls')
 
     def get_service_number(self, description: str) -> Optional[str]:
         """Extract service number from description"""
@@ -695,18 +825,18 @@ class DevoliBilling:
         call_data = data[call_mask].copy()
         
         # Extract call info using vectorized operations
-        call_data['call_info'] = call_data['description'].apply(self.parse_call_info)
-        call_data['num_calls'] = call_data['call_info'].apply(lambda x: x[0])
-        call_data['duration'] = call_data['call_info'].apply(lambda x: x[1])
-        call_data['minutes'] = call_data['duration'].apply(self.duration_to_minutes)
-        call_data['call_type'] = call_data['description'].apply(self.get_call_type)
+        call_info = call_data['description'].str.extract(self.CALLS_PATTERN)
+        call_data['num_calls'] = pd.to_numeric(call_info[0], errors='coerce').fillna(0).astype(int)
+        call_data['duration'] = self.parse_duration_series(call_info[1])
+        call_data['minutes'] = self.duration_to_minutes_series(call_info[1])
+        call_data['call_type'] = self.get_call_types(call_data['description'])
         call_data['rate'] = call_data['call_type'].map(rates)
         call_data['charge'] = call_data['minutes'] * call_data['rate']
         
         results = {}
         
         # Group by customer
-        for customer, group in call_data.groupby('customer_name'):
+        for customer, group in call_data.groupby('customer_name', observed=True):
             results[customer] = {
                 'charges': {},
                 'total': 0,
@@ -788,87 +918,64 @@ class DevoliBilling:
         }
         
         # Create masks for each product type
-        ddi_mask = data['description'].str.contains('DDI', case=False, na=False)
-        sip_mask = data['description'].str.contains('SIP Line', case=False, na=False)
-        ufb_mask = data['description'].str.apply(
-            lambda x: '/29 Range' in str(x) or 'Static IP' in str(x)
+        ddi_mask = data['description'].str.contains(self.DDI_PATTERN, na=False)
+        sip_mask = data['description'].str.contains(self.SIP_LINE_PATTERN, na=False)
+        ufb_mask = data['description'].str.contains(self.UFB_PATTERN, na=False)
+        
+        # Tag each row with its product category (first matching mask wins) and
+        # precompute the columns the charge dicts need in one pass. The masks above
+        # need the raw strings; the grouping keys are categoricals so the groupby
+        # below works on integer codes.
+        data = data.assign(
+            customer_name=data['customer_name'].astype('category'),
+            category=pd.Categorical(np.select(
+                [ddi_mask, sip_mask, ufb_mask],
+                ['ddi_charges', 'sip_lines', 'ufb_services'],
+                default='other_services'
+            )),
+            amount=pd.to_numeric(data['amount'], errors='coerce'),
+            # map(str) keeps the previous str()/f-string rendering, including 'NaT' / 'nan'
+            period=data['start_date'].map(str) + ' - ' + data['end_date'].map(str),
+            service=data['service_number'].map(str) if 'service_number' in data.columns else ''
         )
         
-        # Group by customer and product type
+        # Initialize every customer in all categories (unique() rather than the
+        # categories: a categorical from load_csv keeps customers not in this subset)
         for customer in data['customer_name'].unique():
-            customer_data = data[data['customer_name'] == customer]
-            
-            # Initialize customer in all categories
             for category in results:
-                if customer not in results[category]:
-                    results[category][customer] = {
-                        'charges': [],
-                        'total': 0
-                    }
+                results[category][customer] = {
+                    'charges': [],
+                    'total': 0
+                }
+        
+        # Key used for the service number in each category's charge dicts
+        number_keys = {
+            'ddi_charges': 'number',
+            'sip_lines': 'number',
+            'ufb_services': 'service'
+        }
+        
+        # Single grouped pass over category and customer
+        for (category, customer), items in data.groupby(['category', 'customer_name'], sort=False, observed=True):
+            descriptions = items['description'].to_numpy()
+            amounts = items['amount'].to_numpy(dtype=float)
+            periods = items['period'].to_numpy()
             
-            # Process DDI charges
-            ddi_items = customer_data[ddi_mask]
-            if not ddi_items.empty:
-                charges = ddi_items.apply(
-                    lambda row: {
-                        'description': row['description'],
-                        'amount': float(row['amount']),
-                        'period': f"{row['start_date']} - {row['end_date']}",
-                        'number': str(row.get('service_number', ''))
-                    },
-                    axis=1
-                ).tolist()
-                
-                results['ddi_charges'][customer]['charges'].extend(charges)
-                results['ddi_charges'][customer]['total'] = ddi_items['amount'].sum()
+            number_key = number_keys.get(category)
             
-            # Process SIP lines
-            sip_items = customer_data[sip_mask]
-            if not sip_items.empty:
-                charges = sip_items.apply(
-                    lambda row: {
-                        'description': row['description'],
-                        'amount': float(row['amount']),
-                        'period': f"{row['start_date']} - {row['end_date']}",
-                        'number': str(row.get('service_number', ''))
-                    },
-                    axis=1
-                ).tolist()
-                
-                results['sip_lines'][customer]['charges'].extend(charges)
-                results['sip_lines'][customer]['total'] = sip_items['amount'].sum()
+            # Build the charge dicts and the category total in the same pass
+            charges = []
+            total = 0.0
+            for d, a, p, n in zip(descriptions, amounts, periods, items['service'].to_numpy()):
+                charge = {'description': d, 'amount': float(a), 'period': p}
+                if number_key:
+                    charge[number_key] = n
+                charges.append(charge)
+                if a == a:  # NaN amounts are skipped, as Series.sum() did
+                    total += a
             
-            # Process UFB services
-            ufb_items = customer_data[ufb_mask]
-            if not ufb_items.empty:
-                charges = ufb_items.apply(
-                    lambda row: {
-                        'description': row['description'],
-                        'amount': float(row['amount']),
-                        'period': f"{row['start_date']} - {row['end_date']}",
-                        'service': str(row.get('service_number', ''))
-                    },
-                    axis=1
-                ).tolist()
-                
-                results['ufb_services'][customer]['charges'].extend(charges)
-                results['ufb_services'][customer]['total'] = ufb_items['amount'].sum()
-            
-            # Process other services (everything else)
-            other_mask = ~(ddi_mask | sip_mask | ufb_mask)
-            other_items = customer_data[other_mask]
-            if not other_items.empty:
-                charges = other_items.apply(
-                    lambda row: {
-                        'description': row['description'],
-                        'amount': float(row['amount']),
-                        'period': f"{row['start_date']} - {row['end_date']}"
-                    },
-                    axis=1
-                ).tolist()
-                
-                results['other_services'][customer]['charges'].extend(charges)
-                results['other_services'][customer]['total'] = other_items['amount'].sum()
+            results[category][customer]['charges'].extend(charges)
+            results[category][customer]['total'] = total
         
         return results
 
@@ -884,7 +991,7 @@ class DevoliBilling:
             return "00:00:00"
             
         # First check if it's already in HH:MM:SS format
-        if re.match(r'^\d+:\d{2}:\d{2}$', time_str):
+        if self.HHMMSS_PATTERN.match(time_str):
             return time_str
             
         match = self.DURATION_PATTERN.search(time_str)
@@ -907,7 +1014,7 @@ class DevoliBilling:
             return 0
         
         # Handle direct HH:MM:SS format first
-        if re.match(r'^\d+:\d{2}:\d{2}$', time_str):
+        if self.HHMMSS_PATTERN.match(time_str):
             hours, minutes, seconds = map(int, time_str.split(':'))
             total_minutes = (hours * 60) + minutes
             if seconds > 0:
@@ -925,6 +1032,25 @@ class DevoliBilling:
             
         return total_minutes
 
+    def _duration_parts(self, durations: pd.Series) -> pd.DataFrame:
+        """Split duration strings into integer (days, hours, minutes, seconds) columns, 0 if unparseable"""
+        return durations.str.extract(self.DURATION_PARTS_PATTERN).fillna(0).astype(int)
+
+    def parse_duration_series(self, durations: pd.Series) -> pd.Series:
+        """Vectorized parse_duration: convert a Series of duration strings to HH:MM:SS"""
+        parts = self._duration_parts(durations)
+        total_hours = parts[0] * 24 + parts[1]
+        return (
+            total_hours.astype(str).str.zfill(2) + ':' +
+            parts[2].astype(str).str.zfill(2) + ':' +
+            parts[3].astype(str).str.zfill(2)
+        )
+
+    def duration_to_minutes_series(self, durations: pd.Series) -> pd.Series:
+        """Vectorized duration_to_minutes: total minutes per duration, rounding up part minutes"""
+        parts = self._duration_parts(durations)
+        return parts @ self.DURATION_MINUTES + (parts[3] > 0).astype(int)
+
     def calculate_invoice_date(self, date_str: str) -> str:
         """
         Calculate invoice date:
@@ -933,41 +1059,34 @@ class DevoliBilling:
         etc.
         """
         try:
-            # Parse the original date
-            date = pd.to_datetime(date_str)
-            
-            # Move to next month
-            if date.month == 12:
-                next_month = 1
-                year = date.year + 1
-            else:
-                next_month = date.month + 1
-                year = date.year
-            
-            # Get last day of next month
-            last_day = pd.to_datetime(f"{year}-{next_month}-01") + pd.offsets.MonthEnd(0)
+            # Last day of the month after the billing date (Period arithmetic wraps December)
+            last_day = (pd.Period(pd.to_datetime(date_str), freq='M') + 1).end_time
             return last_day.strftime('%Y-%m-%d')
             
         except Exception as e:
             print(f"Error calculating invoice date: {e}")
             return datetime.now().strftime('%Y-%m-%d')
 
+    def calculate_invoice_dates(self, dates: pd.Series) -> pd.Series:
+        """Column version of calculate_invoice_date; unparseable dates fall back to today"""
+        parsed = pd.to_datetime(dates, errors='coerce')
+        last_days = (parsed.dt.to_period('M') + 1).dt.end_time
+        return last_days.dt.strftime('%Y-%m-%d').fillna(datetime.now().strftime('%Y-%m-%d'))
+
     def load_voip_customers(self, df):
         """Load only customers with VoIP/calling products"""
-        voip_products = [
-            'DDI',
-            'SIP Line',
-            'SIP Trunk',
-            'Calling',
-            'Voice'
-        ]
-        
         # Filter for rows containing our product types silently
-        mask = df['Description'].str.contains('|'.join(voip_products), case=False, na=False)
-        voip_df = df[mask]
+        mask = df['Description'].str.contains(self.VOIP_PATTERN, na=False)
+        voip_df = df[mask].copy()
+        
+        # Few distinct customers over many rows; categorical keeps later filters on integer codes.
+        # An input that is already categorical keeps every level, so drop the ones the
+        # VoIP filter removed.
+        voip_df['Customer Name'] = voip_df['Customer Name'].astype('category').cat.remove_unused_categories()
         
-        # Get unique customers who have these products
-        customers = sorted(voip_df['Customer Name'].dropna().unique())
+        # The levels are the distinct non-null names, so no pass over the rows is needed;
+        # sorted() because an inherited categorical may not be in name order
+        customers = sorted(voip_df['Customer Name'].cat.categories)
         
         return customers, voip_df
 
@@ -1003,50 +1122,39 @@ class DevoliBilling:
             'other': {'count': 0, 'duration': '00:00:00', 'total_seconds': 0}
         }
         
-        # Create masks for each call type
-        type_masks = {
-            'australia': customer_df['description'].str.contains('Australia', case=False, na=False),
-            'local': customer_df['description'].str.contains('Local', case=False, na=False),
-            'mobile': customer_df['description'].str.contains('Mobile', case=False, na=False),
-            'national': customer_df['description'].str.contains('National', case=False, na=False)
-        }
+        if customer_df.empty:
+            return call_data
         
-        # Process each call type
-        for call_type, mask in type_masks.items():
-            if not customer_df[mask].empty:
-                # Get call info for all matching rows
-                calls = customer_df[mask]['description'].apply(self.parse_call_info)
-                
-                # Sum up counts and durations
-                call_data[call_type]['count'] = sum(c[0] for c in calls)
-                
-                # Convert all durations to seconds and sum
-                total_seconds = sum(
-                    sum(int(x) * m for x, m in zip(d[1].split(':'), [3600, 60, 1]))
-                    for _, d in calls
-                )
-                
-                # Store total duration in HH:MM:SS
-                hours = total_seconds // 3600
-                minutes = (total_seconds % 3600) // 60
-                seconds = total_seconds % 60
-                call_data[call_type]['duration'] = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-                call_data[call_type]['total_seconds'] = total_seconds
-        
-        # Handle other calls (those not matching any specific type)
-        other_mask = ~sum(type_masks.values())
-        if not customer_df[other_mask].empty:
-            calls = customer_df[other_mask]['description'].apply(self.parse_call_info)
-            call_data['other']['count'] = sum(c[0] for c in calls)
-            total_seconds = sum(
-                sum(int(x) * m for x, m in zip(d[1].split(':'), [3600, 60, 1]))
-                for _, d in calls
-            )
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            seconds = total_seconds % 60
-            call_data['other']['duration'] = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-            call_data['other']['total_seconds'] = total_seconds
+        descriptions = customer_df['description']
+        
+        # Classify each row once (anything not matching a call type is 'other')
+        call_types = descriptions.str.extract(self.CALL_CATEGORY_PATTERN)[0].str.lower().fillna('other')
+        
+        # Parse call counts and durations for all rows in one regex pass
+        call_info = descriptions.str.extract(self.CALLS_PATTERN)
+        counts = pd.to_numeric(call_info[0], errors='coerce').fillna(0).astype(int)
+        parts = self._duration_parts(call_info[1])
+        total_seconds = parts.to_numpy() @ self.DURATION_SECONDS
+        
+        # Sum counts and durations per call type
+        grouped = pd.DataFrame({
+            'type': call_types,
+            'count': counts,
+            'total_seconds': total_seconds
+        }).groupby('type').sum()
+        
+        # Format every type's total as HH:MM:SS at once (hours may exceed 24)
+        seconds = grouped['total_seconds'].astype('int64')
+        hours, remainder = np.divmod(seconds, 3600)
+        minutes, secs = np.divmod(remainder, 60)
+        durations = (hours.astype(str).str.zfill(2) + ':' +
+                     minutes.astype(str).str.zfill(2) + ':' +
+                     secs.astype(str).str.zfill(2))
+        
+        for call_type, count, duration, total in zip(grouped.index, grouped['count'], durations, seconds):
+            call_data[call_type]['count'] = int(count)
+            call_data[call_type]['duration'] = duration
+            call_data[call_type]['total_seconds'] = int(total)
         
         return call_data
 
@@ -1063,6 +1171,10 @@ class DevoliBilling:
 
     def add_line_item(self, invoice, line_item):
         """Add a line item to an existing invoice"""
+        return self.add_line_items(invoice, [line_item])
+
+    def add_line_items(self, invoice, line_items):
+        """Add several line items to an existing invoice in a single request"""
         try:
             # Better extraction of invoice ID with detailed logging
             invoice_id = None
@@ -1088,19 +1200,14 @@ class DevoliBilling:
                 print("Failed to extract invoice ID, cannot add line item")
                 return None
                 
-            print(f"Adding line item to invoice ID: {invoice_id}")
-            
-            # Set up request
-            headers = self.ensure_xero_connection()
-            headers['Accept'] = 'application/json'
-            headers['Content-Type'] = 'application/json'
+            print(f"Adding {len(line_items)} line item(s) to invoice ID: {invoice_id}")
             
             # Create update payload directly without fetching first (simpler approach)
             update_payload = {
                 "Invoices": [
                     {
                         "InvoiceID": invoice_id,
-                        "LineItems": [line_item]
+                        "LineItems": line_items
                     }
                 ]
             }
@@ -1109,11 +1216,9 @@ class DevoliBilling:
             url = f"{self.XERO_API_URL}/Invoices/{invoice_id}"
             print(f"Sending PUT request to: {url}")
             
-            response = requests.put(
-                url,
-                headers=headers,
-                json=update_payload
-            )
+            # The auth headers already carry Content-Type and the session sends Accept,
+            # so the cached headers are used as-is instead of being extended per call
+            response = self._xero_request('PUT', url, json=update_payload)
             
             # Check response
             if response.status_code in [200, 201, 202]:
@@ -8,6 +8,9 @@ from devoli_billing import DevoliBilling
 from datetime import datetime
 import re
 
+# Invoice CSV columns used by ServiceCompanyBilling.process_billing
+TSC_COLUMNS = {'Customer Name', 'Description', 'Short Description'}
+
 def fix_tsc_invoices():
     """Fix The Service Company invoices by ensuring multiple line items"""
     print("Starting TSC invoice fix")
@@ -28,8 +31,12 @@ def fix_tsc_invoices():
     invoice_path = os.path.join(bills_dir, latest_invoice)
     print(f"Processing: {invoice_path}")
     
-    # Load invoice data
-    df = pd.read_csv(invoice_path)
+    # Load invoice data - only the columns the TSC processor reads
+    df = pd.read_csv(
+        invoice_path,
+        usecols=lambda col: col.strip() in TSC_COLUMNS,
+        dtype=str
+    )
     
     # Clean up column names and customer names
     df.columns = [col.strip() for col in df.columns]
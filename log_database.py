@@ -4,8 +4,79 @@ from datetime import datetime
 import pandas as pd
 import traceback
 import re
+import threading
+import atexit
+import weakref
+from contextlib import contextmanager
+import streamlit as st
+
+# Every LogDatabase created in this process, so their connections can be closed on exit
+_instances = weakref.WeakSet()
+
+@atexit.register
+def _close_all_connections():
+    """Close cached connections at exit so the last one checkpoints the WAL"""
+    for db in list(_instances):
+        db.close_connections()
+
+# Read results are cached across Streamlit reruns. The LogDatabase argument is
+# underscored so Streamlit keys the cache on db_path, query and arguments only. There is
+# one cache for file_processing-only reads and one for reads of invoice_creation, so a
+# write clears just the one(s) whose tables it changed; the TTL covers writes from
+# other processes.
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_file_read(db_path, query, args, _db):
+    return getattr(_db, f'_query_{query}')(*args)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_invoice_read(db_path, query, args, _db):
+    return getattr(_db, f'_query_{query}')(*args)
+
+def _clear_read_caches(files=True, invoices=True):
+    if files:
+        _cached_file_read.clear()
+    if invoices:
+        _cached_invoice_read.clear()
 
 class LogDatabase:
+    # Applied to every new connection. WAL lets readers run alongside a writer and,
+    # with synchronous=NORMAL, commits no longer fsync each time; busy_timeout makes
+    # a locked database wait instead of raising straight away.
+    CONNECTION_PRAGMAS = '''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-8000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+    '''
+
+    # Amounts are stored as integer cents so sums are exact; reads convert back to dollars
+    INVOICE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_processing_id INTEGER,
+        xero_customer_name TEXT NOT NULL,
+        devoli_customer_names TEXT NOT NULL,
+        invoice_number TEXT,
+        invoice_date TIMESTAMP NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        status TEXT DEFAULT 'created',
+        FOREIGN KEY (file_processing_id) REFERENCES file_processing(id)
+    )
+    '''
+
+    # Shared by the single and bulk loggers so both reuse one cached prepared statement
+    INSERT_INVOICE_SQL = '''
+    INSERT INTO invoice_creation 
+    (file_processing_id, xero_customer_name, devoli_customer_names, 
+     invoice_number, invoice_date, amount_cents)
+    VALUES (?, ?, ?, ?, ?, ?)
+    '''
+
+    # Reads that go through the invoice cache; every other read only touches file_processing
+    INVOICE_QUERIES = frozenset({'created_invoices', 'invoice_summary', 'invoiced_filenames'})
+
     def __init__(self, db_path=None):
         """Initialize the logging database"""
         # If no path provided, use data/logs.db as default
@@ -15,13 +86,48 @@ class LogDatabase:
             db_path = os.path.join('data', 'logs.db')
             
         self.db_path = db_path
-        # Don't store a connection as an instance variable
-        # Create it each time it's needed
+        # sqlite3 connections can't be shared across threads, so keep one per
+        # thread (Streamlit runs each session on its own thread) and reuse it
+        self._local = threading.local()
+        # Same connections keyed by thread id, so they can be closed from another thread
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        _instances.add(self)
         self.initialize_db()
     
     def get_connection(self):
-        """Get a new database connection (thread-safe)"""
-        return sqlite3.connect(self.db_path)
+        """Get this thread's database connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Only ever used by the thread that opened it; check_same_thread is
+            # relaxed so close_connections can close it from the exit handler.
+            # Autocommit mode: write transactions are opened explicitly by _transaction.
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.executescript(self.CONNECTION_PRAGMAS)
+            self._local.conn = conn
+            self._track_connection(conn)
+        return conn
+    
+    def _track_connection(self, conn):
+        """Register a new thread's connection, closing any left by finished threads"""
+        with self._connections_lock:
+            live_threads = {thread.ident for thread in threading.enumerate()}
+            stale = [ident for ident in self._connections if ident not in live_threads]
+            for ident in stale:
+                self._connections.pop(ident).close()
+            previous = self._connections.get(threading.get_ident())
+            if previous is not None:
+                # Thread id reused after the previous owner exited
+                previous.close()
+            self._connections[threading.get_ident()] = conn
+    
+    def close_connections(self):
+        """Close every cached connection"""
+        with self._connections_lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
     
     def initialize_db(self):
         """Create database and tables if they don't exist"""
@@ -31,41 +137,72 @@ class LogDatabase:
         if dirname:
             os.makedirs(dirname, exist_ok=True)
         
-        # Create a new connection for initialization
+        # Opening the connection applies the PRAGMAs, so the WAL files exist up front
         conn = self.get_connection()
-        try:
-            cursor = conn.cursor()
-            
-            # Create file_processing table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS file_processing (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL,
-                processing_date TIMESTAMP NOT NULL,
-                user_notes TEXT,
-                file_date TEXT,
-                status TEXT DEFAULT 'processed'
-            )
-            ''')
-            
-            # Create invoice_creation table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invoice_creation (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_processing_id INTEGER,
-                xero_customer_name TEXT NOT NULL,
-                devoli_customer_names TEXT NOT NULL,
-                invoice_number TEXT,
-                invoice_date TIMESTAMP NOT NULL,
-                amount REAL NOT NULL,
-                status TEXT DEFAULT 'created',
-                FOREIGN KEY (file_processing_id) REFERENCES file_processing(id)
-            )
-            ''')
-            
-            conn.commit()
-        finally:
-            conn.close()
+        cursor = conn.cursor()
+
+        # Create file_processing table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS file_processing (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            processing_date TIMESTAMP NOT NULL,
+            user_notes TEXT,
+            file_date TEXT,
+            status TEXT DEFAULT 'processed'
+        )
+        ''')
+        
+        # Create invoice_creation table
+        cursor.execute(self.INVOICE_TABLE_SQL.format(table='invoice_creation'))
+        
+        # Databases created before amounts were stored in cents still have a REAL column
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(invoice_creation)')}
+        if 'amount' in columns:
+            self._migrate_amounts_to_cents(cursor)
+
+        # Indexes for the filename and (file, customer) lookups in
+        # check_if_processed and mark_invoice_as_processed
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS ix_fp_filename ON file_processing(filename)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS ix_inv_lookup
+        ON invoice_creation(file_processing_id, xero_customer_name)
+        ''')
+        # Customer-only lookup for the same-month fallback in check_if_processed
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS ix_inv_customer ON invoice_creation(xero_customer_name)
+        ''')
+
+        # Gather planner statistics once, the first time the indexes exist
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            cursor.execute('ANALYZE')
+
+        conn.commit()
+    
+    def _migrate_amounts_to_cents(self, cursor):
+        """Rebuild invoice_creation with amount_cents in place of the REAL amount column"""
+        cursor.executescript('''
+        BEGIN;
+        DROP TABLE IF EXISTS invoice_creation_cents;
+        ''' + self.INVOICE_TABLE_SQL.format(table='invoice_creation_cents') + ''';
+        INSERT INTO invoice_creation_cents
+        (id, file_processing_id, xero_customer_name, devoli_customer_names,
+         invoice_number, invoice_date, amount_cents, status)
+        SELECT id, file_processing_id, xero_customer_name, devoli_customer_names,
+               invoice_number, invoice_date, CAST(ROUND(amount * 100) AS INTEGER), status
+        FROM invoice_creation;
+        DROP TABLE invoice_creation;
+        ALTER TABLE invoice_creation_cents RENAME TO invoice_creation;
+        COMMIT;
+        ''')
+    
+    @staticmethod
+    def _to_cents(amount):
+        """Dollar amount as whole cents for the amount_cents column"""
+        return int(round(float(amount) * 100))
     
     def log_file_processing(self, filename, user_notes='', file_date=None):
         """Log when a file is processed"""
@@ -76,260 +213,315 @@ class LogDatabase:
             except IndexError:
                 file_date = None
         
-        conn = self.get_connection()
-        try:
-            cursor = conn.cursor()
+        # A new file has no invoices, so the invoice reads are unaffected
+        with self._transaction(invoices=False) as cursor:
             cursor.execute('''
             INSERT INTO file_processing (filename, processing_date, user_notes, file_date)
             VALUES (?, ?, ?, ?)
             ''', (filename, datetime.now().isoformat(), user_notes, file_date))
-            conn.commit()
-            
-            # Return the ID of the new record
-            return cursor.lastrowid
-        finally:
-            conn.close()
+        
+        # Return the ID of the new record
+        return cursor.lastrowid
     
     def log_invoice_creation(self, file_processing_id, xero_customer_name, 
                             devoli_customer_names, invoice_number, amount):
         """Log when an invoice is created in Xero"""
-        conn = self.get_connection()
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-            INSERT INTO invoice_creation 
-            (file_processing_id, xero_customer_name, devoli_customer_names, 
-             invoice_number, invoice_date, amount)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
+        with self._transaction(files=False) as cursor:
+            cursor.execute(self.INSERT_INVOICE_SQL, (
                 file_processing_id, 
                 xero_customer_name, 
                 devoli_customer_names, 
                 invoice_number, 
                 datetime.now().isoformat(), 
-                amount
+                self._to_cents(amount)
             ))
-            conn.commit()
-            return cursor.lastrowid
-        finally:
-            conn.close()
+        return cursor.lastrowid
     
+    def log_invoice_creation_bulk(self, file_processing_id, rows):
+        """Log several created invoices for a file in one transaction
+
+        Each row is (xero_customer_name, devoli_customer_names, invoice_number, amount).
+        """
+        invoice_date = datetime.now().isoformat()
+        with self._transaction(files=False) as cursor:
+            cursor.executemany(self.INSERT_INVOICE_SQL, [
+                (file_processing_id, xero_customer_name, devoli_customer_names,
+                 invoice_number, invoice_date, self._to_cents(amount))
+                for xero_customer_name, devoli_customer_names, invoice_number, amount in rows
+            ])
+
+    @contextmanager
+    def _transaction(self, files=True, invoices=True):
+        """Cursor for a write transaction: commits on success, rolls back on error
+
+        BEGIN IMMEDIATE takes the write lock up front (waiting up to busy_timeout)
+        instead of upgrading a read lock mid-transaction, which can fail straight
+        away with "database is locked" when another connection is writing.
+        Afterwards the cached reads of the tables the caller says it changed
+        (files, invoices) are dropped so the next read sees the change.
+        """
+        conn = self.get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        with conn:
+            yield conn.cursor()
+        _clear_read_caches(files=files, invoices=invoices)
+
+    def _read(self, query, *args):
+        """Run _query_<query>(*args) through the cross-rerun read cache"""
+        reader = _cached_invoice_read if query in self.INVOICE_QUERIES else _cached_file_read
+        return reader(self.db_path, query, args, self)
+
     def get_processed_files(self):
         """Get list of all processed files"""
+        return self._read('processed_files')
+
+    def _query_processed_files(self):
         conn = self.get_connection()
-        try:
-            return pd.read_sql_query('''
-            SELECT id, filename, processing_date, user_notes, file_date, status
-            FROM file_processing
-            ORDER BY processing_date DESC
-            ''', conn)
-        finally:
-            conn.close()
+        return pd.read_sql_query('''
+        SELECT id, filename, processing_date, user_notes, file_date, status
+        FROM file_processing
+        ORDER BY processing_date DESC
+        ''', conn)
     
-    def get_created_invoices(self, file_processing_id=None):
-        """Get list of all created invoices, optionally filtered by file_processing_id"""
+    def get_filenames(self):
+        """Get processed filenames, most recently processed first"""
+        return self._read('filenames')
+
+    def _query_filenames(self):
         conn = self.get_connection()
-        try:
-            query = '''
-            SELECT ic.id, ic.xero_customer_name, ic.devoli_customer_names, 
-                   ic.invoice_number, ic.invoice_date, ic.amount, ic.status,
-                   fp.filename
-            FROM invoice_creation ic
-            JOIN file_processing fp ON ic.file_processing_id = fp.id
-            '''
-            
-            if file_processing_id:
-                query += f' WHERE ic.file_processing_id = {file_processing_id}'
-            
-            query += ' ORDER BY ic.invoice_date DESC'
-            
-            return pd.read_sql_query(query, conn)
-        finally:
-            conn.close()
+        rows = conn.execute('''
+        SELECT filename FROM file_processing ORDER BY processing_date DESC
+        ''').fetchall()
+        return [row[0] for row in rows]
+    
+    def get_file_note(self, filename):
+        """Get (id, user_notes) of the latest record for a file, or None if it isn't logged"""
+        return self._read('file_note', filename)
+
+    def _query_file_note(self, filename):
+        conn = self.get_connection()
+        return conn.execute('''
+        SELECT id, user_notes FROM file_processing
+        WHERE filename = ?
+        ORDER BY processing_date DESC
+        LIMIT 1
+        ''', (filename,)).fetchone()
+    
+    def get_created_invoices(self, file_processing_id=None, filename=None, limit=None, offset=0):
+        """Get list of all created invoices, optionally filtered by file_processing_id
+        or source filename, and optionally one page at a time via limit/offset"""
+        return self._read('created_invoices', file_processing_id, filename, limit, offset)
+
+    @staticmethod
+    def _invoice_filters(file_processing_id=None, filename=None):
+        """WHERE clause and parameters shared by the invoice listing and summary"""
+        conditions = []
+        params = []
+        if file_processing_id:
+            conditions.append('ic.file_processing_id = ?')
+            params.append(file_processing_id)
+        if filename:
+            conditions.append('fp.filename = ?')
+            params.append(filename)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where, params
+
+    def _query_created_invoices(self, file_processing_id, filename, limit, offset):
+        conn = self.get_connection()
+        query = '''
+        SELECT ic.id, ic.xero_customer_name, ic.devoli_customer_names, 
+               ic.invoice_number, ic.invoice_date, ic.amount_cents / 100.0 AS amount, ic.status,
+               fp.filename
+        FROM invoice_creation ic
+        JOIN file_processing fp ON ic.file_processing_id = fp.id
+        '''
+        where, params = self._invoice_filters(file_processing_id, filename)
+        query += where + ' ORDER BY ic.invoice_date DESC'
+
+        if limit is not None:
+            query += ' LIMIT ? OFFSET ?'
+            params += [limit, offset]
+
+        return pd.read_sql_query(query, conn, params=params)
+    
+    def get_invoice_summary(self, filename=None):
+        """Get (invoice count, total amount) over the invoices get_created_invoices lists"""
+        return self._read('invoice_summary', filename)
+
+    def _query_invoice_summary(self, filename):
+        where, params = self._invoice_filters(filename=filename)
+        conn = self.get_connection()
+        count, total_cents = conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(ic.amount_cents), 0)
+        FROM invoice_creation ic
+        JOIN file_processing fp ON ic.file_processing_id = fp.id
+        ''' + where, params).fetchone()
+        return count, total_cents / 100
+    
+    def get_invoiced_filenames(self):
+        """Get the source filenames that have invoices, most recently invoiced first"""
+        return self._read('invoiced_filenames')
+
+    def _query_invoiced_filenames(self):
+        conn = self.get_connection()
+        rows = conn.execute('''
+        SELECT fp.filename
+        FROM invoice_creation ic
+        JOIN file_processing fp ON ic.file_processing_id = fp.id
+        GROUP BY fp.filename
+        ORDER BY MAX(ic.invoice_date) DESC
+        ''').fetchall()
+        return [row[0] for row in rows]
     
     def mark_invoice_as_processed(self, xero_customer_name, filename):
         """Mark a specific customer's invoice as processed for a file"""
-        conn = self.get_connection()
-        try:
-            cursor = conn.cursor()
-            # Find the file processing record
+        # One timestamp for whichever records this call creates
+        now = datetime.now().isoformat()
+        with self._transaction() as cursor:
+            # Find the file processing record (the latest one if the file was logged
+            # again in a later session, which is the record the run logged against)
             cursor.execute('''
-            SELECT id FROM file_processing WHERE filename = ?
+            SELECT id FROM file_processing WHERE filename = ? ORDER BY id DESC LIMIT 1
             ''', (filename,))
             file_record = cursor.fetchone()
-            
-            if not file_record:
+        
+            if file_record:
+                file_processing_id = file_record[0]
+            else:
                 # Create a file processing record if it doesn't exist
                 cursor.execute('''
                 INSERT INTO file_processing (filename, processing_date, user_notes, file_date)
                 VALUES (?, ?, ?, ?)
-                ''', (filename, datetime.now().isoformat(), "Auto-created during invoice processing", None))
-                conn.commit()
-                
-                # Get the new file ID
-                cursor.execute('''
-                SELECT id FROM file_processing WHERE filename = ?
-                ''', (filename,))
-                file_record = cursor.fetchone()
-                
-                if not file_record:
-                    return False
-            
-            file_processing_id = file_record[0]
-            
-            # Check if there's already an invoice record
+                ''', (filename, now, "Auto-created during invoice processing", None))
+                file_processing_id = cursor.lastrowid
+        
+            # Mark the existing invoice record as processed; the UPDATE's row count
+            # tells us whether one exists, so there's no separate SELECT
             cursor.execute('''
-            SELECT id FROM invoice_creation 
+            UPDATE invoice_creation 
+            SET status = 'processed'
             WHERE file_processing_id = ? AND xero_customer_name = ?
             ''', (file_processing_id, xero_customer_name))
-            
-            invoice_record = cursor.fetchone()
-            
-            if invoice_record:
-                # Update existing record
-                cursor.execute('''
-                UPDATE invoice_creation 
-                SET status = 'processed'
-                WHERE id = ?
-                ''', (invoice_record[0],))
-            else:
+        
+            if cursor.rowcount == 0:
                 # Create a new record if none exists
                 cursor.execute('''
                 INSERT INTO invoice_creation 
                 (file_processing_id, xero_customer_name, devoli_customer_names, 
-                invoice_number, invoice_date, amount, status)
+                invoice_number, invoice_date, amount_cents, status)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     file_processing_id, 
                     xero_customer_name, 
                     xero_customer_name, # Use customer name as devoli name if we don't have it
                     'Unknown', # Don't know the invoice number 
-                    datetime.now().isoformat(), 
-                    0.0, # Don't know the amount
+                    now, 
+                    0, # Don't know the amount
                     'processed'
                 ))
-                
-            conn.commit()
-            return True
-        finally:
-            conn.close()
+            
+        return True
     
     def check_if_processed(self, filename, xero_customer_name):
         """Check if a specific invoice has been processed already"""
         conn = self.get_connection()
+        cursor = conn.cursor()
+        
         try:
-            cursor = conn.cursor()
+            # Extract month/year from filename to handle different months
+            month_year = None
+            date_match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
+            if date_match:
+                date_str = date_match.group(1)
+                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+                month_year = date_obj.strftime('%Y-%m')  # Format as YYYY-MM
+                print(f"Extracted month-year from filename: {month_year}")
             
-            try:
-                # Extract month/year from filename to handle different months
-                month_year = None
-                date_match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
-                if date_match:
-                    date_str = date_match.group(1)
-                    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                    month_year = date_obj.strftime('%Y-%m')  # Format as YYYY-MM
-                    print(f"Extracted month-year from filename: {month_year}")
-                
-                # First, check exact filename match for strict checking
-                cursor.execute('''
-                SELECT ic.status FROM invoice_creation ic
-                JOIN file_processing fp ON ic.file_processing_id = fp.id
-                WHERE fp.filename = ? AND ic.xero_customer_name = ?
-                ''', (filename, xero_customer_name))
-                
-                invoice_record = cursor.fetchone()
-                if invoice_record:
-                    # If status is 'processed', it's been processed already
+            # Same-month matches only count for non-TSC customers, as TSC might need
+            # to be processed for multiple files in the same month
+            month_pattern = None
+            if month_year and xero_customer_name != "The Service Company Limited":
+                print(f"Checking if {xero_customer_name} was processed in month {month_year}")
+                month_pattern = f'%{month_year}%'
+            
+            # One lookup for both checks: an exact filename match takes priority
+            # over a match on another file from the same month
+            cursor.execute('''
+            SELECT ic.status, fp.filename = ? AS exact_match
+            FROM invoice_creation ic
+            JOIN file_processing fp ON ic.file_processing_id = fp.id
+            WHERE ic.xero_customer_name = ?
+              AND (fp.filename = ? OR fp.filename LIKE ?)
+            ORDER BY exact_match DESC
+            LIMIT 1
+            ''', (filename, xero_customer_name, filename, month_pattern))
+            
+            invoice_record = cursor.fetchone()
+            if invoice_record:
+                if invoice_record[1]:
                     print(f"Found exact match for {xero_customer_name} in {filename}")
-                    return invoice_record[0] == 'processed'
-                
-                # If month/year was extracted, we can do a broader check 
-                # to see if the same customer was processed in the same month
-                if month_year:
-                    print(f"Checking if {xero_customer_name} was processed in month {month_year}")
-                    # This only applies to non-TSC customers, as TSC might need
-                    # to be processed for multiple files in the same month
-                    if xero_customer_name != "The Service Company Limited":
-                        cursor.execute('''
-                        SELECT ic.status FROM invoice_creation ic
-                        JOIN file_processing fp ON ic.file_processing_id = fp.id
-                        WHERE fp.filename LIKE ? AND ic.xero_customer_name = ?
-                        ''', (f'%{month_year}%', xero_customer_name))
-                        
-                        month_record = cursor.fetchone()
-                        if month_record:
-                            print(f"Found month match for {xero_customer_name} in {month_year}")
-                            return month_record[0] == 'processed'
-                
-                # If not found, return False (not processed)
-                return False
-                
-            except Exception as e:
-                print(f"Database error in check_if_processed: {str(e)}")
-                traceback.print_exc()
-                # If there's any error, assume not processed
-                return False
-        finally:
-            conn.close()
+                else:
+                    print(f"Found month match for {xero_customer_name} in {month_year}")
+                # If status is 'processed', it's been processed already
+                return invoice_record[0] == 'processed'
+            
+            # If not found, return False (not processed)
+            return False
+            
+        except Exception as e:
+            print(f"Database error in check_if_processed: {str(e)}")
+            traceback.print_exc()
+            # If there's any error, assume not processed
+            return False
     
     def update_file_note(self, file_id, note_text):
         """Update the user notes for a file"""
-        conn = self.get_connection()
         try:
-            cursor = conn.cursor()
-            cursor.execute('''
-            UPDATE file_processing SET user_notes = ? WHERE id = ?
-            ''', (note_text, file_id))
-            conn.commit()
+            # Notes aren't part of any invoice read
+            with self._transaction(invoices=False) as cursor:
+                cursor.execute('''
+                UPDATE file_processing SET user_notes = ? WHERE id = ?
+                ''', (note_text, file_id))
             return True
         except Exception as e:
             print(f"Error updating file note: {str(e)}")
             return False
-        finally:
-            conn.close()
 
     def clear_all_data(self):
         """Clear all data from the database"""
-        conn = self.get_connection()
         try:
-            cursor = conn.cursor()
-            # Delete in correct order due to foreign key constraints
-            cursor.execute('DELETE FROM invoice_creation')
-            cursor.execute('DELETE FROM file_processing')
-            conn.commit()
+            with self._transaction() as cursor:
+                # Delete in correct order due to foreign key constraints
+                cursor.execute('DELETE FROM invoice_creation')
+                cursor.execute('DELETE FROM file_processing')
             return True
         except Exception as e:
             print(f"Error clearing database: {str(e)}")
             return False
-        finally:
-            conn.close()
 
     def clear_file_data(self, file_id):
         """Clear all data related to a specific file"""
-        conn = self.get_connection()
         try:
-            cursor = conn.cursor()
-            # Delete invoices first due to foreign key constraint
-            cursor.execute('DELETE FROM invoice_creation WHERE file_processing_id = ?', (file_id,))
-            cursor.execute('DELETE FROM file_processing WHERE id = ?', (file_id,))
-            conn.commit()
+            with self._transaction() as cursor:
+                # Delete invoices first due to foreign key constraint
+                cursor.execute('DELETE FROM invoice_creation WHERE file_processing_id = ?', (file_id,))
+                cursor.execute('DELETE FROM file_processing WHERE id = ?', (file_id,))
             return True
         except Exception as e:
             print(f"Error clearing file data: {str(e)}")
             return False
-        finally:
-            conn.close()
 
     def clear_invoice_data(self, invoice_id):
         """Clear a specific invoice record"""
-        conn = self.get_connection()
         try:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM invoice_creation WHERE id = ?', (invoice_id,))
-            conn.commit()
+            with self._transaction(files=False) as cursor:
+                cursor.execute('DELETE FROM invoice_creation WHERE id = ?', (invoice_id,))
             return True
         except Exception as e:
             print(f"Error clearing invoice data: {str(e)}")
             return False
-        finally:
-            conn.close() 
\ No newline at end of file
+
+@st.cache_resource(show_spinner=False)
+def get_log_database():
+    """Process-wide LogDatabase, so the schema checks run once rather than on every rerun"""
+    return LogDatabase()
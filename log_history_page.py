@@ -1,46 +1,26 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
 import os
-import traceback
-from log_database import LogDatabase
-import time
+from log_database import get_log_database
 
-def format_datetime(dt_str):
-    """Format datetime string for display"""
-    try:
-        if not dt_str or pd.isna(dt_str):
-            return ""
-        dt = datetime.fromisoformat(dt_str)
-        return dt.strftime("%b %d, %Y %I:%M %p")
-    except:
-        return str(dt_str)
+# Rows per page in the Created Invoices table
+INVOICES_PAGE_SIZE = 100
 
-def log_history_page():
-    """Streamlit page for viewing log history"""
-    st.title("Billing Processing History")
-    
-    # Add refresh button
-    if st.button("🔄 Refresh Data", key="refresh_logs"):
-        st.experimental_rerun()
-    
-    # Initialize the database
-    try:
-        db = LogDatabase()
-    except Exception as e:
-        st.error(f"Error initializing database: {str(e)}")
-        st.code(traceback.format_exc())
-        
-        # Provide recovery instructions
-        st.warning("""
-        If you're seeing database errors, you might need to reset the database:
-        1. Stop the application
-        2. Delete the `data/logs.db` file
-        3. Restart the application
-        """)
-        return
+# Display format for logged timestamps
+DISPLAY_DATETIME_FORMAT = "%b %d, %Y %I:%M %p"
 
-    # Add database management section
+def format_datetimes(values):
+    """Format a column of ISO datetime strings for display in one vectorized pass"""
+    parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    formatted = parsed.dt.strftime(DISPLAY_DATETIME_FORMAT)
+    # Blanks stay blank, unparseable values are shown as-is
+    return formatted.fillna(values.where(values.notna(), '').astype(str))
+
+# Sections with their own widgets are fragments: interacting with one reruns
+# just that section, and changes to the data trigger a full st.rerun().
+@st.fragment
+def _database_management(db, files_df):
+    """Database Management expander with the clear actions"""
     with st.expander("Database Management"):
         st.warning("⚠️ Warning: These actions cannot be undone!")
         
@@ -50,10 +30,9 @@ def log_history_page():
             if st.button("Clear All Data", type="primary"):
                 if st.session_state.get('confirm_clear_all'):
                     if db.clear_all_data():
-                        st.success("All data cleared successfully")
+                        st.toast("All data cleared successfully", icon='✅')
                         st.session_state.confirm_clear_all = False
-                        time.sleep(1)
-                        st.experimental_rerun()
+                        st.rerun()
                     else:
                         st.error("Failed to clear data")
                 else:
@@ -61,23 +40,23 @@ def log_history_page():
                     st.warning("Click again to confirm clearing ALL data")
         
         with col2:
-            # Get list of files for selection
-            files_df = db.get_processed_files()
             if not files_df.empty:
+                # filename -> id of its most recent record (files_df is newest first)
+                file_ids = files_df.drop_duplicates('filename').set_index('filename')['id'].to_dict()
                 file_to_clear = st.selectbox(
                     "Select file to clear",
-                    options=files_df['filename'].tolist(),
+                    # The lookup's keys, so every option has an id (and no name is listed twice)
+                    options=list(file_ids),
                     key="file_to_clear"
                 )
-                file_id = files_df[files_df['filename'] == file_to_clear]['id'].iloc[0]
+                file_id = int(file_ids[file_to_clear])
                 
                 if st.button("Clear Selected File"):
                     if st.session_state.get('confirm_clear_file'):
                         if db.clear_file_data(file_id):
-                            st.success(f"Data for {file_to_clear} cleared successfully")
+                            st.toast(f"Data for {file_to_clear} cleared successfully", icon='✅')
                             st.session_state.confirm_clear_file = False
-                            time.sleep(1)
-                            st.experimental_rerun()
+                            st.rerun()
                         else:
                             st.error("Failed to clear file data")
                     else:
@@ -88,29 +67,167 @@ def log_history_page():
             # Get list of invoices for selection
             invoices_df = db.get_created_invoices()
             if not invoices_df.empty:
-                invoice_to_clear = st.selectbox(
+                # Labels built column-wise; the selectbox returns the row position
+                invoice_labels = (invoices_df['xero_customer_name'].astype(str) + ' - '
+                                  + invoices_df['invoice_date'].astype(str)).tolist()
+                invoice_pos = st.selectbox(
                     "Select invoice to clear",
-                    options=[f"{row['xero_customer_name']} - {row['invoice_date']}" 
-                            for _, row in invoices_df.iterrows()],
+                    options=range(len(invoice_labels)),
+                    format_func=invoice_labels.__getitem__,
                     key="invoice_to_clear"
                 )
-                invoice_idx = st.selectbox("Select invoice to clear", 
-                    options=invoices_df.index.tolist(),
-                    format_func=lambda x: f"{invoices_df.loc[x, 'xero_customer_name']} - {invoices_df.loc[x, 'invoice_date']}")
                 
                 if st.button("Clear Selected Invoice"):
                     if st.session_state.get('confirm_clear_invoice'):
-                        invoice_id = invoices_df.loc[invoice_idx, 'id']
+                        invoice_id = int(invoices_df['id'].iat[invoice_pos])
                         if db.clear_invoice_data(invoice_id):
-                            st.success("Invoice cleared successfully")
+                            st.toast("Invoice cleared successfully", icon='✅')
                             st.session_state.confirm_clear_invoice = False
-                            time.sleep(1)
-                            st.experimental_rerun()
+                            st.rerun()
                         else:
                             st.error("Failed to clear invoice data")
                     else:
                         st.session_state.confirm_clear_invoice = True
                         st.warning("Click again to confirm clearing invoice")
+
+@st.fragment
+def _invoices_tab(db, files_df):
+    """Created Invoices tab: metrics, file filter and paged table"""
+    st.subheader("Invoice Creation History")
+
+    try:
+        # Metrics come from a single aggregate row rather than the full table
+        invoice_count, total_amount = db.get_invoice_summary()
+
+        if invoice_count == 0:
+            st.info("No invoices have been created yet.")
+
+            # Check if files exist but no invoices
+            if not files_df.empty:
+                st.warning("Files have been processed, but no invoices were recorded. This could indicate a logging issue.")
+        else:
+            # Display metrics
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total Invoices", invoice_count)
+            col2.metric("Total Amount", f"${total_amount:.2f}")
+            col3.metric("Average Invoice", f"${(total_amount / invoice_count):.2f}")
+
+            # Add filter by file
+            selected_file = st.selectbox(
+                "Filter by file",
+                options=["All Files"] + db.get_invoiced_filenames(),
+                index=0
+            )
+            file_filter = selected_file if selected_file != "All Files" else None
+
+            # Only the current page of the (filtered) table is read from the database
+            matching_count = invoice_count if file_filter is None else db.get_invoice_summary(file_filter)[0]
+            page_count = max(1, -(-matching_count // INVOICES_PAGE_SIZE))
+            page = st.number_input(
+                "Page", min_value=1, max_value=page_count, value=1, step=1,
+                # Per-filter key so switching files starts again at page 1
+                key=f"invoice_page_{selected_file}"
+            )
+            filtered_df = db.get_created_invoices(
+                filename=file_filter,
+                limit=INVOICES_PAGE_SIZE,
+                offset=(page - 1) * INVOICES_PAGE_SIZE
+            )
+
+            # Format dates for display
+            filtered_df['invoice_date'] = format_datetimes(filtered_df['invoice_date'])
+
+            # Display as a dataframe
+            st.dataframe(
+                filtered_df,
+                column_config={
+                    "xero_customer_name": st.column_config.TextColumn("Xero Customer"),
+                    "devoli_customer_names": st.column_config.TextColumn("Devoli Names"),
+                    "invoice_number": st.column_config.TextColumn("Invoice #"),
+                    "invoice_date": st.column_config.TextColumn("Created On"),
+                    "amount": st.column_config.NumberColumn("Amount", format="$%.2f"),
+                    "status": st.column_config.TextColumn("Status"),
+                    "filename": st.column_config.TextColumn("Source File"),
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+
+            # Add debug info
+            st.caption(f"Debug: Found {invoice_count} invoices, showing page {page} of {page_count}")
+    except Exception as e:
+        st.error(f"Error loading created invoices: {str(e)}")
+        st.exception(e)
+
+@st.fragment
+def _file_notes(db):
+    """Add Notes to File section"""
+    st.subheader("Add Notes to File")
+    
+    try:
+        # Plain list straight from SQLite; the dropdown doesn't need a DataFrame
+        files = db.get_filenames()
+    except Exception as e:
+        st.error(f"Error with file notes: {str(e)}")
+        st.exception(e)
+        return
+    
+    if not files:
+        st.info("No files available to add notes.")
+    else:
+        selected_file = st.selectbox("Select file", files, index=0 if files else None)
+        
+        if selected_file:
+            try:
+                file_id, current_note = db.get_file_note(selected_file)
+            except Exception as e:
+                st.error(f"Error retrieving file details: {str(e)}")
+                return
+
+            new_note = st.text_area("Notes", value=str(current_note) if current_note else "")
+
+            if st.button("Update Notes"):
+                try:
+                    # Update note in database
+                    result = db.update_file_note(file_id, new_note)
+                except Exception as e:
+                    st.error(f"Error updating notes: {str(e)}")
+                    return
+
+                if result:
+                    st.toast(f"Notes updated for {selected_file}", icon='✅')
+                    st.rerun()
+                else:
+                    st.error("Failed to update notes")
+
+def log_history_page():
+    """Streamlit page for viewing log history"""
+    st.title("Billing Processing History")
+    
+    # Add refresh button
+    if st.button("🔄 Refresh Data", key="refresh_logs"):
+        st.rerun()
+    
+    # Initialize the database
+    try:
+        db = get_log_database()
+        # Fetched once per rerun and shared by the management, files and invoices sections
+        files_df = db.get_processed_files()
+    except Exception as e:
+        st.error(f"Error initializing database: {str(e)}")
+        st.exception(e)
+        
+        # Provide recovery instructions
+        st.warning("""
+        If you're seeing database errors, you might need to reset the database:
+        1. Stop the application
+        2. Delete the `data/logs.db` file
+        3. Restart the application
+        """)
+        return
+
+    # Add database management section
+    _database_management(db, files_df)
     
     # Create tabs for Files and Invoices
     tab1, tab2 = st.tabs(["Processed Files", "Created Invoices"])
@@ -119,18 +236,15 @@ def log_history_page():
         st.subheader("Files Processing History")
         
         try:
-            # Get processed files
-            files_df = db.get_processed_files()
-            
             if files_df.empty:
                 st.info("No files have been processed yet.")
             else:
-                # Format dates for display
-                files_df['processing_date'] = files_df['processing_date'].apply(format_datetime)
+                # Format dates for display (on a copy; files_df is shared with the other sections)
+                display_df = files_df.assign(processing_date=format_datetimes(files_df['processing_date']))
                 
                 # Display as a dataframe with filters
                 st.dataframe(
-                    files_df,
+                    display_df,
                     column_config={
                         "id": st.column_config.NumberColumn("ID"),
                         "filename": st.column_config.TextColumn("Filename"),
@@ -147,105 +261,10 @@ def log_history_page():
                 st.caption(f"Debug: Found {len(files_df)} processed files")
         except Exception as e:
             st.error(f"Error loading processed files: {str(e)}")
-            st.code(traceback.format_exc())
+            st.exception(e)
     
     with tab2:
-        st.subheader("Invoice Creation History")
-        
-        try:
-            # Get created invoices
-            invoices_df = db.get_created_invoices()
-            
-            if invoices_df.empty:
-                st.info("No invoices have been created yet.")
-                
-                # Check if files exist but no invoices
-                try:
-                    files_df = db.get_processed_files()
-                    if not files_df.empty:
-                        st.warning("Files have been processed, but no invoices were recorded. This could indicate a logging issue.")
-                except:
-                    pass
-            else:
-                # Format dates for display
-                invoices_df['invoice_date'] = invoices_df['invoice_date'].apply(format_datetime)
-                
-                # Calculate total amount processed
-                total_amount = invoices_df['amount'].sum()
-                
-                # Display metrics
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Total Invoices", len(invoices_df))
-                col2.metric("Total Amount", f"${total_amount:.2f}")
-                col3.metric("Average Invoice", f"${(total_amount / len(invoices_df)):.2f}" if len(invoices_df) > 0 else "$0.00")
-                
-                # Add filter by file
-                unique_files = invoices_df['filename'].unique()
-                selected_file = st.selectbox(
-                    "Filter by file",
-                    options=["All Files"] + list(unique_files),
-                    index=0
-                )
-                
-                if selected_file != "All Files":
-                    filtered_df = invoices_df[invoices_df['filename'] == selected_file]
-                else:
-                    filtered_df = invoices_df
-                    
-                # Display as a dataframe
-                st.dataframe(
-                    filtered_df,
-                    column_config={
-                        "xero_customer_name": st.column_config.TextColumn("Xero Customer"),
-                        "devoli_customer_names": st.column_config.TextColumn("Devoli Names"),
-                        "invoice_number": st.column_config.TextColumn("Invoice #"),
-                        "invoice_date": st.column_config.TextColumn("Created On"),
-                        "amount": st.column_config.NumberColumn("Amount", format="$%.2f"),
-                        "status": st.column_config.TextColumn("Status"),
-                        "filename": st.column_config.TextColumn("Source File"),
-                    },
-                    use_container_width=True,
-                    hide_index=True
-                )
-                
-                # Add debug info
-                st.caption(f"Debug: Found {len(invoices_df)} invoices")
-        except Exception as e:
-            st.error(f"Error loading created invoices: {str(e)}")
-            st.code(traceback.format_exc())
-            
-    # Add section for adding notes to files
-    st.subheader("Add Notes to File")
+        _invoices_tab(db, files_df)
     
-    try:
-        files_df = db.get_processed_files()
-        files = files_df['filename'].tolist() if not files_df.empty else []
-        
-        if not files:
-            st.info("No files available to add notes.")
-        else:
-            selected_file = st.selectbox("Select file", files, index=0 if files else None)
-            
-            if selected_file:
-                try:
-                    file_id = files_df[files_df['filename'] == selected_file]['id'].iloc[0]
-                    current_note = files_df[files_df['filename'] == selected_file]['user_notes'].iloc[0]
-                    
-                    new_note = st.text_area("Notes", value=str(current_note) if current_note else "")
-                    
-                    if st.button("Update Notes"):
-                        try:
-                            # Update note in database
-                            result = db.update_file_note(file_id, new_note)
-                            if result:
-                                st.success(f"Notes updated for {selected_file}")
-                                st.rerun()
-                            else:
-                                st.error("Failed to update notes")
-                        except Exception as e:
-                            st.error(f"Error updating notes: {str(e)}")
-                except Exception as e:
-                    st.error(f"Error retrieving file details: {str(e)}")
-    except Exception as e:
-        st.error(f"Error with file notes: {str(e)}")
-        st.code(traceback.format_exc()) 
\ No newline at end of file
+    # Add section for adding notes to files
+    _file_notes(db)
@@ -1,35 +1,61 @@
 import streamlit as st
 import pandas as pd
-from devoli_billing import DevoliBilling
+import numpy as np
+import io
+import os
+import re
+from devoli_billing import DevoliBilling, _load_customer_mapping_cached
 
-def calculate_customer_totals(df, customer):
-    """Calculate minutes and charges for a customer"""
-    customer_df = df[df['Customer Name'] == customer]
-    
-    # Calculate total minutes
-    call_rows = customer_df[customer_df['Description'].str.contains('Calling|Voice', na=False, case=False)]
-    total_minutes = call_rows['Quantity'].sum() if 'Quantity' in call_rows else 0
-    
-    # Calculate DDI charges
-    ddi_rows = customer_df[customer_df['Description'].str.contains('DDI', na=False)]
-    ddi_charges = ddi_rows['Amount'].sum()
+# Invoice CSV columns used on this page (Quantity may be absent)
+INVOICE_COLUMNS = {'Customer Name', 'Description', 'Quantity', 'Amount'}
+
+# Call usage rows, matched case-insensitively against Description
+CALL_PATTERN = re.compile(r'Calling|Voice', re.IGNORECASE)
+
+@st.cache_data(show_spinner=False)
+def _load_invoice_csv_cached(data: bytes) -> pd.DataFrame:
+    """Parse an uploaded invoice CSV; the file bytes key the cache so a new upload invalidates it"""
+    return pd.read_csv(io.BytesIO(data), usecols=lambda col: col in INVOICE_COLUMNS)
+
+@st.cache_resource(show_spinner=False)
+def _get_processor() -> DevoliBilling:
+    """One DevoliBilling for the page instead of a new one per rerun"""
+    return DevoliBilling()
+
+@st.cache_data(show_spinner=False)
+def _load_voip_customers_cached(data: bytes):
+    """VoIP customers of an uploaded invoice CSV, keyed on the file bytes like the parse itself"""
+    return _get_processor().load_voip_customers(_load_invoice_csv_cached(data))
+
+def calculate_customer_totals(df):
+    """Calculate minutes and charges for every customer in one pass
     
-    # Total charges
-    total_charges = customer_df['Amount'].sum()
+    Returns a DataFrame indexed by customer name with minutes, ddi_charges
+    and total_charges columns.
+    """
+    description = df['Description']
+    is_call = description.str.contains(CALL_PATTERN, na=False)
+    is_ddi = description.str.contains('DDI', na=False, regex=False)
     
-    return {
-        'minutes': int(total_minutes),
-        'ddi_charges': float(ddi_charges),
-        'total_charges': float(total_charges)
-    }
+    return pd.DataFrame({
+        # Total minutes
+        'minutes': (df.loc[is_call].groupby('Customer Name', sort=False)['Quantity'].sum()
+                    if 'Quantity' in df else None),
+        # DDI charges
+        'ddi_charges': df.loc[is_ddi].groupby('Customer Name', sort=False)['Amount'].sum(),
+        # Total charges
+        'total_charges': df.groupby('Customer Name', sort=False)['Amount'].sum(),
+    }).fillna(0)
 
 def process_page():
     st.title("Process Invoices")
     
     # Load customer mappings
     try:
-        mapping_df = pd.read_csv('customer_mapping.csv')
-        mappings = dict(zip(mapping_df['devoli_name'], mapping_df['actual_xero_name']))
+        # Same mtime-keyed loader as DevoliBilling, so edits on the mappings page show up
+        mappings = _load_customer_mapping_cached(
+            'customer_mapping.csv', os.path.getmtime('customer_mapping.csv')
+        )
     except:
         st.error("No customer mappings found. Please create mappings first.")
         return
@@ -37,34 +63,30 @@ def process_page():
     # File upload
     uploaded_file = st.file_uploader("Upload Devoli Invoice CSV", type=['csv'])
     if uploaded_file:
-        df = pd.read_csv(uploaded_file)
+        # Parsed once per upload, not on every widget interaction
+        data = uploaded_file.getvalue()
+        df = _load_invoice_csv_cached(data)
         
         # Get VoIP customers
-        processor = DevoliBilling()
-        voip_customers, voip_df = processor.load_voip_customers(df)
+        voip_customers, voip_df = _load_voip_customers_cached(data)
+        
+        # Totals for all customers at once, aligned to the VoIP customer list
+        customer_totals = calculate_customer_totals(df).reindex(voip_customers, fill_value=0)
         
-        # Create processing table
-        process_data = []
-        for customer in voip_customers:
-            xero_name = mappings.get(customer, 'NO MAPPING')
-            totals = calculate_customer_totals(df, customer)
-            
-            process_data.append({
-                'Devoli Name': customer,
-                'Xero Name': xero_name,
-                'Minutes': totals['minutes'],
-                'DDI Charges': f"${totals['ddi_charges']:.2f}",
-                'Total Charges': f"${totals['total_charges']:.2f}",
-                'Status': 'Ready' if xero_name != 'NO MAPPING' else 'Missing Mapping'
-            })
+        # Create processing table column by column
+        process_df = pd.DataFrame({'Devoli Name': voip_customers})
+        process_df['Xero Name'] = process_df['Devoli Name'].map(mappings).fillna('NO MAPPING')
+        process_df['Minutes'] = customer_totals['minutes'].to_numpy().astype(int)
+        process_df['DDI Charges'] = customer_totals['ddi_charges'].map('${:.2f}'.format).to_numpy()
+        process_df['Total Charges'] = customer_totals['total_charges'].map('${:.2f}'.format).to_numpy()
+        process_df['Status'] = np.where(process_df['Xero Name'] == 'NO MAPPING', 'Missing Mapping', 'Ready')
         
         # Show processing table
         st.write("### Customers to Process")
-        process_df = pd.DataFrame(process_data)
         st.dataframe(process_df)
         
         # Process button
-        ready_to_process = len([x for x in process_data if x['Status'] == 'Ready'])
+        ready_to_process = int((process_df['Status'] == 'Ready').sum())
         if ready_to_process > 0:
             if st.button(f"Process {ready_to_process} Customers"):
                 with st.spinner("Processing invoices..."):
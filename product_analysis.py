@@ -5,8 +5,35 @@ import plotly.graph_objects as go
 import re
 import os
 import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import numpy as np
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Invoice CSV columns read by the analysis, after lower-casing and stripping the header
+INVOICE_COLUMNS = {'description', 'customer name', 'amount'}
+
+@st.cache_data(show_spinner=False)
+def _load_invoice_cached(file_path: str, mtime: float) -> pd.DataFrame:
+    """Read an invoice CSV with cleaned, categorised products; mtime keys the cache so edits invalidate it"""
+    # Only the columns the analysis uses (header case and padding vary between exports)
+    df = pd.read_csv(file_path, usecols=lambda col: col.strip().lower() in INVOICE_COLUMNS)
+    df.columns = df.columns.str.lower().str.strip()
+    
+    # Clean descriptions and drop rows that aren't products
+    df['clean description'] = clean_product_descriptions(df['description'].fillna('').astype(str))
+    df = df[df['clean description'].notna() & (df['clean description'] != '')]
+    
+    # Categorised once here; every tab and the trends metrics reuse the column
+    df['category'] = assign_category(df['clean description'])
+    
+    # Few distinct customers and products over many rows; categoricals group on int codes
+    return df.astype({'customer name': 'category', 'clean description': 'category'})
+
+def load_invoice(file_path):
+    """Return the cleaned invoice DataFrame for file_path, parsed once per version of the file"""
+    return _load_invoice_cached(file_path, os.path.getmtime(file_path))
 
 def process_all_invoices():
     """Process all invoice files and return monthly metrics.
@@ -20,57 +47,75 @@ def process_all_invoices():
             - monthly_metrics_df: DataFrame with columns [date, unique_customers, total_quantity, total_revenue]
             - category_metrics_df: DataFrame with columns [date, category, revenue, quantity]
     """
-    monthly_metrics = []
-    category_metrics = []
+    # (filename, mtime) of every invoice, so adding or editing a file changes the cache key
+    file_sig = tuple(sorted(
+        (f, os.path.getmtime(os.path.join("bills", f)))
+        for f in os.listdir("bills")
+        if f.startswith("Invoice_") and f.endswith(".csv")
+    ))
+    return _process_all_invoices_cached(file_sig)
+
+def _invoice_metrics(f, mtime):
+    """Overall and per-category metrics for one invoice file, or None if it can't be processed"""
+    try:
+        # Extract date from filename
+        date_str = f.split('_')[2].split('.')[0]
+        invoice_date = pd.to_datetime(date_str, format='%Y-%m-%d')
+        
+        # Read and process invoice (shared with the page's own reads of the same file)
+        df = _load_invoice_cached(os.path.join("bills", f), mtime)
+        
+        # Calculate overall metrics
+        metrics = {
+            'date': invoice_date,
+            'unique_customers': df['customer name'].nunique(),
+            'total_quantity': len(df),
+            'total_revenue': df['amount'].sum()
+        }
+        
+        # Calculate category metrics in one grouped pass
+        by_category = df.groupby('category')['amount'].agg(revenue='sum', quantity='size').reset_index()
+        by_category.insert(0, 'date', invoice_date)
+        
+        return metrics, by_category
+    except Exception as e:
+        print(f"Error processing {f}: {str(e)}")
+        return None
+
+@st.cache_data(show_spinner=False)
+def _process_all_invoices_cached(file_sig, max_workers=4):
+    """process_all_invoices body, cached on the (filename, mtime) signature of bills/"""
+    if not file_sig:
+        return pd.DataFrame(), pd.DataFrame()
     
-    for f in os.listdir("bills"):
-        if f.startswith("Invoice_") and f.endswith(".csv"):
-            try:
-                # Extract date from filename
-                date_str = f.split('_')[2].split('.')[0]
-                invoice_date = pd.to_datetime(date_str)
-                
-                # Read and process invoice
-                df = pd.read_csv(os.path.join("bills", f))
-                df.columns = df.columns.str.lower().str.strip()
-                
-                # Clean descriptions
-                descriptions = [clean_product_description(str(desc)) for desc in df['description'].fillna('')]
-                df['clean description'] = descriptions
-                df = df[df['clean description'].notna() & (df['clean description'] != '')]
-                
-                # Add categories
-                df['category'] = df['clean description'].apply(lambda x: 
-                    'UFB Services' if 'UFB' in x 
-                    else 'Call Services' if 'Calls' in x 
-                    else 'DDI Services' if 'DDI' in x 
-                    else 'Data Services' if 'Data' in x 
-                    else 'Other Services'
-                )
-                
-                # Calculate overall metrics
-                metrics = {
-                    'date': invoice_date,
-                    'unique_customers': df['customer name'].nunique(),
-                    'total_quantity': len(df),
-                    'total_revenue': df['amount'].sum()
-                }
-                monthly_metrics.append(metrics)
-                
-                # Calculate category metrics
-                for category in df['category'].unique():
-                    cat_data = df[df['category'] == category]
-                    category_metrics.append({
-                        'date': invoice_date,
-                        'category': category,
-                        'revenue': cat_data['amount'].sum(),
-                        'quantity': len(cat_data)
-                    })
-                
-            except Exception as e:
-                print(f"Error processing {f}: {str(e)}")
+    # Files are processed concurrently; the CSV parser and most of the pandas work
+    # release the GIL. Workers are bound to the Streamlit script context so the
+    # per-file cache behaves as it does on the main thread.
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(file_sig)),
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    ) as executor:
+        results = [r for r in executor.map(lambda item: _invoice_metrics(*item), file_sig) if r]
     
-    return pd.DataFrame(monthly_metrics), pd.DataFrame(category_metrics)
+    monthly_metrics = [metrics for metrics, _ in results]
+    category_metrics = [by_category for _, by_category in results]
+    category_df = pd.concat(category_metrics, ignore_index=True) if category_metrics else pd.DataFrame()
+    return pd.DataFrame(monthly_metrics), category_df
+
+# Checked in order; the first match wins
+CATEGORY_RULES = [
+    ('UFB', 'UFB Services'),
+    ('Calls', 'Call Services'),
+    ('DDI', 'DDI Services'),
+    ('Data', 'Data Services'),
+]
+
+def assign_category(descriptions: pd.Series) -> np.ndarray:
+    """Map cleaned product descriptions to their revenue category in one vectorized pass"""
+    conditions = [descriptions.str.contains(token, regex=False) for token, _ in CATEGORY_RULES]
+    choices = [category for _, category in CATEGORY_RULES]
+    return np.select(conditions, choices, default='Other Services')
 
 def clean_product_description(desc: str) -> str:
     """Clean and standardize product descriptions.
@@ -140,9 +185,70 @@ def clean_product_description(desc: str) -> str:
             desc = 'Unlimited Data - Public'
         else:
             desc = 'Unlimited Data - Other'
-            
+
     return desc.strip() if desc else None
 
+def clean_product_descriptions(descriptions: pd.Series) -> pd.Series:
+    """Vectorized clean_product_description over a Series of description strings.
+
+    Applies the same rules in the same order, but as whole-column string
+    operations and one np.select instead of a Python call per row.
+
+    Args:
+        descriptions (pd.Series): Raw product descriptions (strings)
+
+    Returns:
+        pd.Series: Standardized descriptions, None where the row should be filtered out
+    """
+    if descriptions.empty:
+        return pd.Series(index=descriptions.index, dtype=object)
+
+    desc = descriptions.str.strip()
+
+    def has(series, text):
+        return series.str.contains(text, regex=False)
+
+    # Product type before the first '-' and the details after it
+    parts = desc.str.split('-', n=1, expand=True).reindex(columns=[0, 1])
+    has_details = parts[1].notna()
+    product_type = parts[0].str.strip()
+    details = parts[1].fillna('').str.strip()
+
+    calls = has(desc, 'Calls')
+    ufb = has_details & (product_type == 'UFB')
+    data = has_details & (product_type == 'Unlimited Data')
+
+    # (condition, result) pairs; np.select takes the first that matches
+    rules = [
+        # Call types first
+        (calls & has(desc, 'Mobile Calls'), 'Mobile Calls'),
+        (calls & has(desc, 'Local Calls'), 'Local Calls'),
+        (calls & has(desc, 'Australia Calls'), 'Australia Calls'),
+        (calls & has(desc, 'International Calls'), 'International Calls'),
+        (calls, 'Other Calls'),
+        # No product type: only DDI blocks are kept
+        (~has_details & has(desc, 'DDI Block') & has(desc, 'Australia'), 'Australia DDI Block'),
+        (~has_details & has(desc, 'DDI Block'), 'DDI Block'),
+        (~has_details, None),
+        # Basic product name cleaning
+        (ufb & has(details, 'Small Business Fibre 920'), 'UFB - Small Business Fibre 920'),
+        (ufb & has(details, 'Small Business Fibre 500'), 'UFB - Small Business Fibre 500'),
+        (ufb & has(details, 'Home Fibre 920'), 'UFB - Home Fibre 920'),
+        (ufb & has(details, 'Evolve 200/20/S'), 'UFB - Evolve 200/20/S'),
+        (ufb, 'UFB - Other'),
+        (has_details & (product_type == 'Wholesale International DDI'), 'DDI'),
+        (data & has(details, 'CG Nat'), 'Unlimited Data - CG NAT'),
+        (data & has(details, 'Static IP'), 'Unlimited Data - Static IP'),
+        (data & has(details, 'Public'), 'Unlimited Data - Public'),
+        (data, 'Unlimited Data - Other'),
+    ]
+    cleaned = np.select(
+        [condition.to_numpy(dtype=bool) for condition, _ in rules],
+        [np.array(result, dtype=object) for _, result in rules],
+        default=desc.to_numpy(dtype=object)
+    )
+    return pd.Series(cleaned, index=descriptions.index, dtype=object)
+
 def product_analysis_page():
     """Main product analysis page with multiple analysis views.
     
@@ -175,12 +281,16 @@ def product_analysis_page():
     # Create dropdown for invoice selection with proper sorting
     invoice_options = {}
     file_dates = []
-    for f in invoice_files:
-        date_str = f.split('_')[2].split('.')[0]
-        file_date = pd.to_datetime(date_str)
+    # 'YYYY-MM' -> file, so the trends and month-over-month tabs can look up a
+    # month's invoice without listing and re-parsing the directory again
+    files_by_month = {}
+    # Dates parsed in one vectorized call with the known filename format
+    invoice_dates = pd.to_datetime([f.split('_')[2].split('.')[0] for f in invoice_files], format='%Y-%m-%d')
+    for f, file_date in zip(invoice_files, invoice_dates):
         display_name = f"{file_date.strftime('%B %Y')} ({f.split('_')[0]}_{f.split('_')[1]})"
         invoice_options[display_name] = f
         file_dates.append((display_name, file_date))
+        files_by_month.setdefault(file_date.strftime('%Y-%m'), f)
     
     # Sort by date in descending order (newest first)
     sorted_options = [x[0] for x in sorted(file_dates, key=lambda x: x[1], reverse=True)]
@@ -195,18 +305,8 @@ def product_analysis_page():
         invoice_file = os.path.join("bills", invoice_options[selected_invoice])
         
         try:
-            # Read CSV
-            df = pd.read_csv(invoice_file)
-            
-            # Convert columns to lowercase
-            df.columns = df.columns.str.lower().str.strip()
-            
-            # Clean descriptions using list comprehension instead of apply
-            descriptions = [clean_product_description(str(desc)) for desc in df['description'].fillna('')]
-            df['clean description'] = descriptions
-            
-            # Remove None values and empty strings
-            df = df[df['clean description'].notna() & (df['clean description'] != '')]
+            # Read CSV with cleaned, categorised products (cached until the file changes)
+            df = load_invoice(invoice_file)
             
             # Create tabs for different views
             tab1, tab2, tab3, tab4, tab5 = st.tabs(["Summary", "Customer Analysis", "Revenue Analysis", "Trends", "Changes"])
@@ -214,7 +314,7 @@ def product_analysis_page():
             with tab1:
                 # Product Summary
                 st.subheader("Product Summary")
-                product_counts = df.groupby('clean description').agg({
+                product_counts = df.groupby('clean description', observed=True).agg({
                     'customer name': 'nunique',  # Count unique customers
                     'amount': ['count', 'sum']
                 }).reset_index()
@@ -254,26 +354,24 @@ def product_analysis_page():
                 significant_products_list = significant_products['Product Type'].tolist()
                 df_filtered = df[df['clean description'].isin(significant_products_list)]
                 
-                # Add category for revenue analysis
-                df_filtered['category'] = df_filtered['clean description'].apply(lambda x: 
-                    'UFB Services' if 'UFB' in x 
-                    else 'Call Services' if 'Calls' in x 
-                    else 'DDI Services' if 'DDI' in x 
-                    else 'Data Services' if 'Data' in x 
-                    else 'Other Services'
-                )
+                # Revenue and line counts per customer/category/product in one grouped pass;
+                # both matrices below are rolled up from it
+                customer_products = df_filtered.groupby(
+                    ['customer name', 'category', 'clean description'], observed=True
+                )['amount'].agg(['sum', 'count'])
                 
                 # Create revenue by customer and category
-                customer_revenue = df_filtered.pivot_table(
-                    values='amount',
-                    index='customer name',
-                    columns='category',
-                    aggfunc='sum',
-                    fill_value=0
-                ).reset_index()
+                customer_revenue = (
+                    customer_products['sum']
+                    .groupby(level=['customer name', 'category'], observed=True).sum()
+                    .unstack(fill_value=0)
+                    .reset_index()
+                )
                 
                 # Sort by total revenue
-                customer_revenue['total_revenue'] = customer_revenue.iloc[:, 1:].sum(axis=1)
+                customer_revenue['total_revenue'] = (
+                    customer_revenue.drop(columns='customer name').to_numpy(dtype=np.float64).sum(axis=1)
+                )
                 customer_revenue = customer_revenue.sort_values('total_revenue', ascending=False)
                 
                 # Create stacked bar chart for top 15 customers
@@ -284,12 +382,17 @@ def product_analysis_page():
                 categories = [col for col in top_customers.columns if col not in ['customer name', 'total_revenue']]
                 
                 for category in categories:
+                    # Most cells are zero (customers use few categories); only label the positive ones
+                    values = top_customers[category]
+                    labels = pd.Series('', index=values.index)
+                    positive = values > 0
+                    labels[positive] = values[positive].map('${:,.2f}'.format)
                     fig_customer_revenue.add_trace(
                         go.Bar(
                             name=category,
                             x=top_customers['customer name'],
-                            y=top_customers[category],
-                            text=top_customers[category].apply(lambda x: f'${x:,.2f}' if x > 0 else ''),
+                            y=values,
+                            text=labels,
                             textposition='auto',
                         )
                     )
@@ -332,22 +435,22 @@ def product_analysis_page():
                 
                 # Original Products by Customer matrix
                 st.subheader("Products by Customer (Quantity)")
-                pivot_df = pd.pivot_table(
-                    df_filtered,
-                    values='amount',
-                    index='customer name',
-                    columns='clean description',
-                    aggfunc='count',
-                    fill_value=0
-                ).reset_index()
+                pivot_df = (
+                    customer_products['count']
+                    .groupby(level=['customer name', 'clean description'], observed=True).sum()
+                    .unstack(fill_value=0)
+                    .reset_index()
+                )
                 
                 # Process pivot table as before
                 pivot_df = pivot_df.rename(columns={'customer name': 'Customer'})
                 product_columns = [col for col in pivot_df.columns if col != 'Customer']
-                pivot_df['total_products'] = pivot_df[product_columns].sum(axis=1)
-                pivot_df = pivot_df[pivot_df['total_products'] > 0].drop('total_products', axis=1)
-                pivot_df['total_count'] = pivot_df[product_columns].sum(axis=1)
+                # Row totals as a single NumPy reduction over the count columns
+                product_totals = pivot_df[product_columns].to_numpy(dtype=np.int64).sum(axis=1)
+                pivot_df['total_count'] = product_totals
+                pivot_df = pivot_df[product_totals > 0]
                 pivot_df = pivot_df.sort_values(['total_count', 'Customer'], ascending=[False, True])
+                product_totals = pivot_df['total_count'].to_numpy()
                 pivot_df = pivot_df.drop('total_count', axis=1)
                 
                 st.dataframe(
@@ -360,33 +463,18 @@ def product_analysis_page():
                 
                 # Top Customers by Product Count
                 st.subheader("Top 10 Customers by Number of Products")
-                customer_totals = pivot_df.iloc[:, 1:].sum(axis=1)
+                # pivot_df is already ordered by product count, so the top 10 are its first rows
                 customer_totals = pd.DataFrame({
-                    'Customer': pivot_df['Customer'],
-                    'Total Products': customer_totals
+                    'Customer': pivot_df['Customer'].iloc[:10],
+                    'Total Products': product_totals[:10]
                 })
-                st.bar_chart(customer_totals.nlargest(10, 'Total Products').set_index('Customer'))
+                st.bar_chart(customer_totals.set_index('Customer'))
             
             with tab3:
                 # Revenue Analysis
                 st.subheader("Revenue Insights")
                 
                 # Revenue by Product Category
-                product_categories = []
-                for product in df['clean description']:
-                    if 'UFB' in product:
-                        category = 'UFB Services'
-                    elif 'Calls' in product:
-                        category = 'Call Services'
-                    elif 'DDI' in product:
-                        category = 'DDI Services'
-                    elif 'Data' in product:
-                        category = 'Data Services'
-                    else:
-                        category = 'Other Services'
-                    product_categories.append(category)
-                
-                df['category'] = product_categories
                 category_revenue = df.groupby('category')['amount'].sum().reset_index()
                 
                 # Show category breakdown
@@ -433,28 +521,16 @@ def product_analysis_page():
                 
                 # Get the latest month's data for detailed breakdown
                 latest_month = monthly_df['date'].max()
-                latest_file = None
-                for f in os.listdir("bills"):
-                    if f.startswith("Invoice_") and f.endswith(".csv"):
-                        date_str = f.split('_')[2].split('.')[0]
-                        if pd.to_datetime(date_str).strftime('%Y-%m') == latest_month.strftime('%Y-%m'):
-                            latest_file = f
-                            break
+                latest_file = files_by_month.get(latest_month.strftime('%Y-%m'))
                 
                 if latest_file:
-                    latest_df = pd.read_csv(os.path.join("bills", latest_file))
-                    latest_df.columns = latest_df.columns.str.lower().str.strip()
-                    latest_df['clean description'] = [clean_product_description(str(desc)) for desc in latest_df['description'].fillna('')]
-                    latest_df = latest_df[latest_df['clean description'].notna() & (latest_df['clean description'] != '')]
+                    if latest_file == invoice_options[selected_invoice]:
+                        # Usually the selected invoice, which is already loaded
+                        latest_df = df
+                    else:
+                        latest_df = load_invoice(os.path.join("bills", latest_file))
                     
                     # Calculate category metrics
-                    latest_df['category'] = latest_df['clean description'].apply(lambda x: 
-                        'UFB Services' if 'UFB' in x 
-                        else 'Call Services' if 'Calls' in x 
-                        else 'DDI Services' if 'DDI' in x 
-                        else 'Data Services' if 'Data' in x 
-                        else 'Other Services'
-                    )
                     
                     category_metrics = latest_df.groupby('category').agg({
                         'amount': 'sum',
@@ -491,18 +567,17 @@ def product_analysis_page():
                     with col2:
                         st.bar_chart(category_metrics.set_index('category')['amount'])
                 
-                # Set date as index and resample monthly for overall metrics
-                monthly_df = monthly_df.set_index('date')
-                monthly_df = monthly_df.resample('M').agg({
+                # Resample monthly on the date column for overall metrics
+                # (month-end 'ME'; the old 'M' alias is rejected by current pandas)
+                monthly_df = monthly_df.resample('ME', on='date').agg({
                     'unique_customers': 'last',
                     'total_quantity': 'sum',
                     'total_revenue': 'sum'
                 }).reset_index()
                 
-                # Process category trends
-                category_df = category_df.set_index('date')
-                category_df = category_df.groupby(['date', 'category'])['revenue'].sum().reset_index()
-                category_df = category_df.set_index('date').groupby('category').resample('M')['revenue'].sum().reset_index()
+                # Process category trends: one per-category monthly resample
+                # (empty months between invoices still come out as 0)
+                category_df = category_df.groupby('category').resample('ME', on='date')['revenue'].sum().reset_index()
                 
                 # Sort chronologically and format dates
                 monthly_df = monthly_df.sort_values('date')
@@ -675,33 +750,16 @@ def product_analysis_page():
                 st.subheader("Month-over-Month Changes")
                 
                 # Get current and previous month files
-                current_date = pd.to_datetime(invoice_file.split('_')[2].split('.')[0])
+                current_date = dict(file_dates)[selected_invoice]
                 previous_date = current_date - pd.DateOffset(months=1)
                 
-                previous_file = None
-                for f in os.listdir("bills"):
-                    if f.startswith("Invoice_") and f.endswith(".csv"):
-                        file_date = pd.to_datetime(f.split('_')[2].split('.')[0])
-                        if file_date.strftime('%Y-%m') == previous_date.strftime('%Y-%m'):
-                            previous_file = os.path.join("bills", f)
-                            break
+                previous_file = files_by_month.get(previous_date.strftime('%Y-%m'))
+                if previous_file:
+                    previous_file = os.path.join("bills", previous_file)
                 
                 if previous_file:
                     # Read previous month's data
-                    prev_df = pd.read_csv(previous_file)
-                    prev_df.columns = prev_df.columns.str.lower().str.strip()
-                    prev_df['clean description'] = [clean_product_description(str(desc)) for desc in prev_df['description'].fillna('')]
-                    prev_df = prev_df[prev_df['clean description'].notna() & (prev_df['clean description'] != '')]
-                    
-                    # Add categories
-                    for data in [prev_df, df]:
-                        data['category'] = data['clean description'].apply(lambda x: 
-                            'UFB Services' if 'UFB' in x 
-                            else 'Call Services' if 'Calls' in x 
-                            else 'DDI Services' if 'DDI' in x 
-                            else 'Data Services' if 'Data' in x 
-                            else 'Other Services'
-                        )
+                    prev_df = load_invoice(previous_file)
                     
                     # 1. Overall Changes
                     st.subheader(f"Overall Changes ({previous_date.strftime('%B %Y')} → {current_date.strftime('%B %Y')})")
@@ -851,8 +909,8 @@ def product_analysis_page():
                     st.subheader("Customer Revenue Changes")
                     
                     # Calculate customer revenue for both months
-                    prev_cust = prev_df.groupby('customer name')['amount'].sum().reset_index()
-                    curr_cust = df.groupby('customer name')['amount'].sum().reset_index()
+                    prev_cust = prev_df.groupby('customer name', observed=True)['amount'].sum().reset_index()
+                    curr_cust = df.groupby('customer name', observed=True)['amount'].sum().reset_index()
                     
                     # Merge and calculate changes
                     cust_changes = pd.merge(
@@ -887,8 +945,8 @@ def product_analysis_page():
                             
                             # Compare products side by side
                             product_comparison = pd.merge(
-                                prev_detail.groupby(['clean description', 'category'])['amount'].sum().reset_index(),
-                                curr_detail.groupby(['clean description', 'category'])['amount'].sum().reset_index(),
+                                prev_detail.groupby(['clean description', 'category'], observed=True)['amount'].sum().reset_index(),
+                                curr_detail.groupby(['clean description', 'category'], observed=True)['amount'].sum().reset_index(),
                                 on=['clean description', 'category'],
                                 how='outer',
                                 suffixes=('_prev', '_curr')
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import re
 from datetime import datetime
 import os
@@ -35,6 +36,12 @@ class ServiceCompanyBilling:
         total_seconds = (hours * 3600) + (minutes * 60) + seconds
         return (total_seconds + 59) // 60  # Round up to nearest minute
 
+    def durations_to_minutes(self, durations):
+        """Vectorized convert_to_minutes for a Series of HH:MM:SS strings"""
+        parts = durations.str.split(':', expand=True).reindex(columns=[0, 1, 2]).astype(int)
+        total_seconds = parts[0] * 3600 + parts[1] * 60 + parts[2]
+        return (total_seconds + 59) // 60  # Round up to nearest minute
+
     def process_billing(self, input_data):
         """Process billing for The Service Company"""
         # Handle both DataFrame and file path inputs
@@ -80,101 +87,71 @@ class ServiceCompanyBilling:
         for number in tfree_numbers:
             results['numbers'][number] = {'calls': [], 'total': 0}
         
-        # Process each row
-        call_count = 0
-        tfree_call_count = 0
-        regular_call_count = 0
+        # Call rows, with the count and duration pulled out of every description in one pass
+        call_rows = df[df['Description'].str.contains('Calls', regex=False, na=False)]
+        details = call_rows['Description'].str.extract(r'(\d+) calls? - ([\d:]+)')
+        matched = details[0].notna()
+        for desc in call_rows['Description'][~matched]:
+            print(f"[DEBUG] No call match for description: {desc}")
         
-        for _, row in df.iterrows():
-            desc = row['Description']
-            
-            # Skip non-call rows
-            if 'Calls' not in desc:
-                continue
-                
-            # Extract call details using regex
-            call_match = re.search(r'(\d+) calls? - ([\d:]+)', desc)
-            if not call_match:
-                print(f"[DEBUG] No call match for description: {desc}")
-                continue
-                
-            call_count += 1
-            num_calls = int(call_match.group(1))
-            duration = call_match.group(2)
-            minutes = self.convert_to_minutes(duration)
-            number = row['Short Description']
-            
-            # Process TFree calls
-            if 'TFree Inbound' in desc:
-                if number not in results['numbers']:
-                    print(f"[DEBUG] TFree number {number} not in initialized numbers dict")
-                    continue
-                    
-                # Determine call type
-                if 'Mobile' in desc:
-                    call_type = 'TFree Inbound - Mobile'
-                elif 'National' in desc:
-                    call_type = 'TFree Inbound - National'
-                elif 'Australia' in desc:
-                    call_type = 'TFree Inbound - Australia'
-                elif 'Other' in desc:
-                    call_type = 'TFree Inbound - Other'
-                else:
-                    print(f"[DEBUG] Could not determine TFree call type from: {desc}")
-                    continue
-                
-                rate = self.rates.get(call_type)
-                if not rate:
-                    print(f"[DEBUG] No rate found for call type: {call_type}")
-                    continue
-                    
-                charge = round(minutes * rate, 2)
-                tfree_call_count += 1
-                
-                # Store call details
-                results['numbers'][number]['calls'].append({
-                    'type': call_type,
-                    'count': num_calls,
-                    'duration': duration,
-                    'minutes': minutes,
-                    'rate': rate,
-                    'charge': charge
-                })
-                results['numbers'][number]['total'] += charge
-            
-            # Process regular number calls
-            else:
-                # Determine call type and rate
-                if 'Australia' in desc:  # Check Australia first to avoid matching others
-                    call_type = 'Australia'
-                elif 'Local' in desc:
-                    call_type = 'Local'
-                elif 'Mobile' in desc:
-                    call_type = 'Mobile'
-                elif 'National' in desc:
-                    call_type = 'National'
-                else:
-                    print(f"[DEBUG] Could not determine regular call type from: {desc}")
-                    continue
-                
-                rate = self.rates.get(call_type)
-                if not rate:
-                    print(f"[DEBUG] No rate found for call type: {call_type}")
-                    continue
-                    
-                charge = round(minutes * rate, 2)
-                regular_call_count += 1
-                
-                # Store call details
-                results['regular_number']['calls'].append({
-                    'type': call_type,
-                    'count': num_calls,
-                    'duration': duration,
-                    'minutes': minutes,
-                    'rate': rate,
-                    'charge': charge
-                })
-                results['regular_number']['total'] += charge
+        calls = pd.DataFrame({
+            'number': call_rows['Short Description'][matched],
+            'desc': call_rows['Description'][matched],
+            'count': details[0][matched].astype(int),
+            'duration': details[1][matched],
+        })
+        call_count = len(calls)
+        calls['minutes'] = self.durations_to_minutes(calls['duration'])
+        
+        # Call type per row; the first matching rule wins, as in the old if/elif chains
+        def has(text):
+            return calls['desc'].str.contains(text, regex=False).to_numpy(dtype=bool)
+        tfree = has('TFree Inbound')
+        type_rules = [
+            (tfree & has('Mobile'), 'TFree Inbound - Mobile'),
+            (tfree & has('National'), 'TFree Inbound - National'),
+            (tfree & has('Australia'), 'TFree Inbound - Australia'),
+            (tfree & has('Other'), 'TFree Inbound - Other'),
+            # Regular number: check Australia first to avoid matching others
+            (~tfree & has('Australia'), 'Australia'),
+            (~tfree & has('Local'), 'Local'),
+            (~tfree & has('Mobile'), 'Mobile'),
+            (~tfree & has('National'), 'National'),
+        ]
+        calls['type'] = np.select(
+            [condition for condition, _ in type_rules],
+            [np.array(call_type, dtype=object) for _, call_type in type_rules],
+            default=None
+        )
+        calls['rate'] = calls['type'].map(self.rates)
+        
+        # Report and drop the rows the old per-row loop skipped
+        unknown_number = tfree & ~calls['number'].isin(tfree_numbers).to_numpy(dtype=bool)
+        for number in calls['number'][unknown_number]:
+            print(f"[DEBUG] TFree number {number} not in initialized numbers dict")
+        untyped = ~unknown_number & calls['type'].isna().to_numpy(dtype=bool)
+        for is_tfree, desc in zip(tfree[untyped], calls['desc'][untyped]):
+            kind = 'TFree' if is_tfree else 'regular'
+            print(f"[DEBUG] Could not determine {kind} call type from: {desc}")
+        unrated = ~unknown_number & ~untyped & (calls['rate'].fillna(0) == 0).to_numpy(dtype=bool)
+        for call_type in calls['type'][unrated]:
+            print(f"[DEBUG] No rate found for call type: {call_type}")
+        keep = ~(unknown_number | untyped | unrated)
+        tfree = tfree[keep]
+        calls = calls[keep]
+        
+        calls['charge'] = (calls['minutes'] * calls['rate']).round(2)
+        tfree_call_count = int(tfree.sum())
+        regular_call_count = len(calls) - tfree_call_count
+        
+        # Store call details; totals are summed in row order like the old running totals
+        call_columns = ['type', 'count', 'duration', 'minutes', 'rate', 'charge']
+        regular_calls = calls[~tfree]
+        results['regular_number']['calls'] = regular_calls[call_columns].to_dict('records')
+        results['regular_number']['total'] = sum(regular_calls['charge'].tolist())
+        for number, number_calls in calls[tfree].groupby('number', sort=False):
+            results['numbers'][number]['calls'] = number_calls[call_columns].to_dict('records')
+            results['numbers'][number]['total'] = sum(number_calls['charge'].tolist())
         
         # Debug call counts
         print(f"[DEBUG] Processed {call_count} total calls: {regular_call_count} regular, {tfree_call_count} TFree")
@@ -236,17 +213,22 @@ class ServiceCompanyBilling:
             'national': {'count': 0, 'duration': '00:00:00'}
         }
         
-        for _, row in df.iterrows():
-            desc = row['Description']
-            count, duration = self.extract_call_details(desc)
-            call_type = self.classify_call_type(desc)
-            
-            if call_type in call_data:
-                call_data[call_type]['count'] += count
-                call_data[call_type]['duration'] = self.sum_durations(
-                    call_data[call_type]['duration'], 
-                    duration
-                )
+        if df.empty:
+            return call_data
+        
+        # Counts and seconds per row, summed per call type; durations are only
+        # formatted as HH:MM:SS once per type at the end
+        counts, seconds = self.extract_call_seconds(df['Description'])
+        call_types = self.classify_call_types(df['Description'])
+        totals = pd.DataFrame({'type': call_types, 'count': counts, 'seconds': seconds})
+        totals = totals.groupby('type', sort=False)[['count', 'seconds']].sum()
+        
+        for call_type, data in call_data.items():
+            if call_type in totals.index:
+                data['count'] = int(totals.at[call_type, 'count'])
+                h, rem = divmod(int(totals.at[call_type, 'seconds']), 3600)
+                m, s = divmod(rem, 60)
+                data['duration'] = f"{h:02d}:{m:02d}:{s:02d}"
         
         return call_data
 
@@ -294,6 +276,28 @@ class ServiceCompanyBilling:
         except:
             return 0, "00:00:00"
 
+    def extract_call_seconds(self, descriptions):
+        """Vectorized extract_call_details, with durations in seconds.
+        
+        Returns (counts, seconds) arrays. Rows extract_call_details rejects get a
+        count of 0, and durations sum_durations can't parse add 0 seconds.
+        """
+        found = descriptions.str.extract(r'(\d+) calls? - ((?:\d+ days? )?[\d:]+)')
+        duration = found[1]
+        time_parts = duration.str.extract(r'^(?:(\d+) days? )?(?:(\d+):)?(\d+):(\d+)$')
+        
+        # "X days" durations need a full HH:MM:SS, the rest at least one ':'
+        day_format = duration.str.contains('day', regex=False, na=False)
+        valid = (found[0].notna()
+                 & ~(day_format & time_parts[1].isna())
+                 & (day_format | duration.str.contains(':', regex=False, na=False)))
+        parsed = valid & time_parts[3].notna()
+        
+        days, hours, minutes, secs = (time_parts[i].fillna('0').astype(np.int64) for i in range(4))
+        total_seconds = days * 86400 + hours * 3600 + minutes * 60 + secs
+        counts = found[0].fillna('0').astype(np.int64)
+        return counts.where(valid, 0).to_numpy(), total_seconds.where(parsed, 0).to_numpy()
+
     def classify_call_type(self, desc):
         """Determine call type from description"""
         desc_lower = desc.lower()
@@ -307,6 +311,16 @@ class ServiceCompanyBilling:
             return 'national'
         return None
 
+    def classify_call_types(self, descriptions):
+        """Vectorized classify_call_type; '' where no call type matches"""
+        desc_lower = descriptions.str.lower()
+        call_types = ['australia', 'local', 'mobile', 'national']
+        return np.select(
+            [desc_lower.str.contains(call_type, regex=False, na=False).to_numpy(dtype=bool) for call_type in call_types],
+            call_types,
+            default=''
+        )
+
     def sum_durations(self, dur1, dur2):
         """Add two durations in HH:MM:SS format"""
         def to_seconds(dur):
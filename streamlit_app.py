@@ -8,7 +8,7 @@ import re
 from service_company import ServiceCompanyBilling
 import time
 from product_analysis import product_analysis_page
-from log_database import LogDatabase
+from log_database import get_log_database
 from log_history_page import log_history_page
 import datetime
 import json
@@ -31,7 +31,7 @@ def init_session_state():
         except:
             st.session_state.xero_connected = False
     if 'log_db' not in st.session_state:
-        st.session_state.log_db = LogDatabase()
+        st.session_state.log_db = get_log_database()
     if 'current_file_log_id' not in st.session_state:
         st.session_state.current_file_log_id = None
 
@@ -244,9 +244,12 @@ def process_page():
                 
                 # Create selection table
                 process_data = []
+                # Partition rows by customer once instead of rescanning df per name
+                customer_frames = dict(list(df.groupby('Customer Name', sort=False)))
                 for xero_name, customers in xero_groups.items():
                     # Combine data for all customers
-                    combined_df = pd.concat([df[df['Customer Name'] == name] for name in customers])
+                    frames = [customer_frames[name] for name in customers if name in customer_frames]
+                    combined_df = pd.concat(frames) if frames else df.iloc[0:0]
                     
                     # Check if this is The Service Company
                     is_service_company = any(
@@ -528,6 +531,8 @@ def confirm_page():
     try:
         # Get processor from session state
         processor = st.session_state.billing_processor
+        # Fetch Xero contacts once for this run rather than once per invoice
+        processor.clear_contact_cache()
         
         # Process each selected company
         results = []
@@ -887,6 +892,8 @@ def process_selected_companies(selected_companies, df):
     
     results = []
     billing_processor = st.session_state.billing_processor
+    # Fetch Xero contacts once for this run rather than once per invoice
+    billing_processor.clear_contact_cache()
     
     # Create a progress bar
     progress_bar = st.progress(0)